@@ -1,44 +1,90 @@
+import argparse
 import os
 import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
 
 # Add the current directory to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from py_midicsv.csvmidi import parse as csv_to_midi
+from py_midicsv.csvmidi_stream import parse as csv_to_midi
+from py_midicsv.manifest import Manifest, atomic_open
 from py_midicsv.midi.fileio import FileWriter
 
+# Conversions recorded between saves of the manifest in incremental mode
+MANIFEST_SAVE_INTERVAL = 1000
 
-def convert_csv_to_midi(csv_file, output_dir):
-    """Convert a CSV file to MIDI."""
+
+def midi_path(csv_file, output_dir):
+    """Return the path of the MIDI file converted from csv_file."""
+    # Get base name without extension
+    base_name = os.path.splitext(os.path.basename(csv_file))[0]
+    return os.path.join(output_dir, f"{base_name}.mid")
+
+
+def convert_timed(csv_file, output_dir):
+    """Convert a CSV file to MIDI and return (csv_file, midi_file, error, seconds) instead of printing."""
+    start = time.perf_counter()
+    midi_file = midi_path(csv_file, output_dir)
     try:
-        # Get base name without extension
-        base_name = os.path.splitext(os.path.basename(csv_file))[0]
-        
-        # Create output file path
-        midi_file = os.path.join(output_dir, f"{base_name}.mid")
-        
         # Convert CSV to MIDI
         with open(csv_file, 'r') as csv_input:
             midi_data = csv_to_midi(csv_input)
-            
-        # Save MIDI file
-        with open(midi_file, 'wb') as midi_output:
+
+        # Save MIDI file; it only replaces the previous one once it is complete
+        with atomic_open(midi_file) as midi_output:
             writer = FileWriter(midi_output)
             writer.write(midi_data)
-            
-        print(f"✓ Converted {os.path.basename(csv_file)} to {os.path.basename(midi_file)}")
-        return True
+        error = None
     except Exception as e:
-        print(f"❌ Error converting {os.path.basename(csv_file)}: {str(e)}")
-        return False
+        error = str(e)
+    return csv_file, midi_file, error, time.perf_counter() - start
+
+
+def report(result):
+    """Print the outcome of convert_timed and return whether it succeeded."""
+    csv_file, midi_file, error, seconds = result
+    if error is None:
+        print(f"✓ Converted {os.path.basename(csv_file)} to {os.path.basename(midi_file)} ({seconds:.3f}s)")
+        return True
+    print(f"❌ Error converting {os.path.basename(csv_file)}: {error} ({seconds:.3f}s)")
+    return False
 
 
-def batch_convert():
-    """Convert all CSV files in the Input directory to MIDI."""
+def convert_csv_to_midi(csv_file, output_dir):
+    """Convert a CSV file to MIDI."""
+    return report(convert_timed(csv_file, output_dir))
+
+
+def convert_parallel(csv_files, output_dir, jobs):
+    """Convert CSV files in a pool of jobs worker processes, yielding the results of convert_timed as they complete.
+
+    Files are handed out in the given order, and only a couple per worker
+    are queued at a time, so a large batch is not submitted all at once.
+    """
+    pending_files = iter(csv_files)
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        pending = {executor.submit(convert_timed, f, output_dir) for f in islice(pending_files, 2 * jobs)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+            for csv_file in islice(pending_files, len(done)):
+                pending.add(executor.submit(convert_timed, csv_file, output_dir))
+
+
+def batch_convert(jobs=1, input_dir=None, output_dir=None, incremental=False):
+    """Convert all CSV files in the Input directory to MIDI, in jobs processes.
+
+    In incremental mode, files whose content was converted with the same
+    settings before, and whose MIDI file is unchanged, are skipped. This is
+    tracked in a manifest in the output directory.
+    """
     # Set directories
     script_dir = os.path.dirname(os.path.abspath(__file__))
-    input_dir = os.path.join(script_dir, "Input")
-    output_dir = os.path.join(script_dir, "Output")
+    input_dir = input_dir or os.path.join(script_dir, "Input")
+    output_dir = output_dir or os.path.join(script_dir, "Output")
     
     # Ensure directories exist
     if not os.path.exists(input_dir):
@@ -65,22 +111,57 @@ def batch_convert():
     failed = 0
     
     # Convert each file
-    for csv_file in csv_files:
-        csv_path = os.path.join(input_dir, csv_file)
-        result = convert_csv_to_midi(csv_path, output_dir)
-        if result:
-            successful += 1
-        else:
-            failed += 1
+    csv_paths = [os.path.join(input_dir, csv_file) for csv_file in csv_files]
+    manifest = Manifest(output_dir) if incremental else None
+    if manifest is not None:
+        keys = {csv_path: manifest.key(csv_path) for csv_path in csv_paths}
+        csv_paths = [p for p in csv_paths if manifest.lookup(keys[p], midi_path(p, output_dir)) is None]
+        skipped = len(keys) - len(csv_paths)
+        print(f"Skipping {skipped} unchanged files")
+    if jobs > 1:
+        # Largest files first, so that the last conversions to finish are short ones
+        csv_paths.sort(key=os.path.getsize, reverse=True)
+        results = convert_parallel(csv_paths, output_dir, jobs)
+    else:
+        results = (convert_timed(csv_path, output_dir) for csv_path in csv_paths)
+    try:
+        for result in results:
+            if report(result):
+                successful += 1
+                if manifest is not None:
+                    manifest.record(keys[result[0]], result[1])
+                    if successful % MANIFEST_SAVE_INTERVAL == 0:
+                        manifest.save()
+            else:
+                failed += 1
+    finally:
+        if manifest is not None:
+            manifest.save()
     
     # Print summary
     print("\nBatch conversion complete!")
     print(f"Successful conversions: {successful}")
     print(f"Failed conversions: {failed}")
+    if manifest is not None:
+        print(f"Unchanged files skipped: {skipped}")
     print(f"Output files saved to: {output_dir}")
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert all CSV files in Input/ to MIDI files in Output/.")
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=1, help="Convert files in this many worker processes (default: 1)"
+    )
+    parser.add_argument(
+        "-i",
+        "--incremental",
+        action="store_true",
+        help="Skip files converted before whose content and MIDI file have not changed",
+    )
+    args = parser.parse_args()
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+
     print("CSV to MIDI Batch Converter")
     print("===========================\n")
-    batch_convert()
\ No newline at end of file
+    batch_convert(args.jobs, incremental=args.incremental)
\ No newline at end of file
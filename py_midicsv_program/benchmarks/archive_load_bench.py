@@ -0,0 +1,57 @@
+"""Time to load the same events from an event archive, a MIDI file and a CSV file.
+
+Run from the py_midicsv_program directory:
+
+    python benchmarks/archive_load_bench.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dispatch_bench import make_pattern
+
+from py_midicsv.csvmidi_stream import parse as csv_to_midi
+from py_midicsv.midi import columnar  # noqa: F401 (imports numpy before timing)
+from py_midicsv.midi.archive import read_archive, write_archive
+from py_midicsv.midi.fileio import read_midifile, write_midifile
+from py_midicsv.midicsv_stream import parse as midi_to_csv
+
+# Copies of the generated track in the pattern
+TRACKS = 5
+
+
+def timed(name, load, size):
+    start = time.perf_counter()
+    result = load()
+    elapsed = time.perf_counter() - start
+    print(f"{name:>22}: {elapsed * 1000:10.2f} ms  {size / 1e6:7.1f} MB")
+    return result
+
+
+def main():
+    track = make_pattern("note-only")[0]
+    pattern = make_pattern("note-only")
+    pattern[:] = [track] * TRACKS
+    with tempfile.TemporaryDirectory() as tmp:
+        archive_path, midi_path, csv_path = (os.path.join(tmp, name) for name in ("events.arc", "x.mid", "x.csv"))
+        write_archive(archive_path, pattern)
+        write_midifile(midi_path, pattern)
+        with open(csv_path, "w") as out:
+            midi_to_csv(midi_path, validation="none", out=out)
+        print(f"{len(track) * TRACKS:,} events")
+        archive = timed("read_archive", lambda: read_archive(archive_path), os.path.getsize(archive_path))
+        table = timed("EventArchive.columnar", archive.columnar, os.path.getsize(archive_path))
+        print(f"{'':>22}  {int((table.events['status'] == 0x90).sum()):,} note on rows")
+        del table
+        archive.close()
+        timed("read_midifile", lambda: read_midifile(midi_path, True, validation="none"), os.path.getsize(midi_path))
+        with open(csv_path) as inp:
+            timed("csvmidi_stream.parse", lambda: csv_to_midi(inp), os.path.getsize(csv_path))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Time to write a generated note table through write_columnar and through event objects.
+
+Run from the py_midicsv_program directory:
+
+    python benchmarks/columnar_write_bench.py
+"""
+
+import io
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from py_midicsv.midi.columnar import write_columnar
+from py_midicsv.midi.containers import Pattern, Track
+from py_midicsv.midi.events import EndOfTrackEvent, NoteOffEvent, NoteOnEvent
+from py_midicsv.midi.fileio import FileWriter
+
+EVENTS = 1000000
+
+
+def make_table(events=EVENTS, seed=1):
+    rng = np.random.default_rng(seed)
+    return {
+        "abs_tick": np.cumsum(rng.integers(0, 240, events)),
+        "status": np.where(np.arange(events) % 2 == 0, 0x90, 0x80),
+        "channel": rng.integers(0, 4, events),
+        "data1": rng.integers(30, 90, events),
+        "data2": rng.integers(1, 128, events),
+    }
+
+
+def write_objects(table):
+    track = Track(tick_relative=False)
+    for tick, status, channel, data1, data2 in zip(
+        *(table[name].tolist() for name in ("abs_tick", "status", "channel", "data1", "data2"))
+    ):
+        cls = NoteOnEvent if status == 0x90 else NoteOffEvent
+        track.append(cls(tick=tick, channel=channel, data=[data1, data2]))
+    track.append(EndOfTrackEvent(tick=track[-1].tick))
+    pattern = Pattern(tracks=[track], resolution=480, tick_relative=False)
+    pattern.make_ticks_rel()
+    out = io.BytesIO()
+    FileWriter(out).write(pattern)
+    return out.getvalue()
+
+
+def write_table(table):
+    out = io.BytesIO()
+    write_columnar(out, [table], resolution=480)
+    return out.getvalue()
+
+
+def main():
+    table = make_table()
+    results = {}
+    for name, write in (("objects", write_objects), ("write_columnar", write_table)):
+        start = time.perf_counter()
+        results[name] = write(table)
+        elapsed = time.perf_counter() - start
+        print(f"{name:>15}: {elapsed:7.3f}s  {EVENTS / elapsed:12,.0f} events/s")
+    assert results["objects"] == results["write_columnar"]
+
+
+if __name__ == "__main__":
+    main()
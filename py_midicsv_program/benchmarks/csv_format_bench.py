@@ -0,0 +1,70 @@
+"""Lines per second formatted by the MIDI to CSV converters.
+
+Compares the converters in midi_to_csv_map with formatting channel, text
+and End_track events through the generic write_event, on tests/sample.mid
+and on a generated note-only file.
+
+Run from the py_midicsv_program directory:
+
+    python benchmarks/csv_format_bench.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dispatch_bench import make_pattern
+
+from py_midicsv.events import midi_to_csv_map
+from py_midicsv.midi.events import *
+from py_midicsv.midi.fileio import read_midifile
+from py_midicsv.midi_converters import as_csv_str, write_event
+
+# How each event type was formatted before the formatters: through write_event
+CHANNEL_EVENTS = {
+    NoteOffEvent: "Note_off_c",
+    NoteOnEvent: "Note_on_c",
+    AfterTouchEvent: "Poly_aftertouch_c",
+    ControlChangeEvent: "Control_c",
+    ProgramChangeEvent: "Program_c",
+}
+TEXT_EVENTS = {TextMetaEvent: "Text_t", TrackNameEvent: "Title_t", InstrumentNameEvent: "Instrument_name_t"}
+
+
+def generic(track, time, event):
+    if type(event) in CHANNEL_EVENTS:
+        return write_event(track, time, CHANNEL_EVENTS[type(event)], [event.channel, *event.data])
+    if type(event) in TEXT_EVENTS:
+        return write_event(track, time, TEXT_EVENTS[type(event)], [f'"{as_csv_str(event.text)}"'])
+    if type(event) is EndOfTrackEvent:
+        return write_event(track, time, "End_track", [])
+    return midi_to_csv_map[type(event)](track, time, event)
+
+
+def rate(events, convert, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for track, tick, event in events:
+            convert(track, tick, event)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(events) / best
+
+
+def main():
+    inputs = (("sample.mid", read_midifile("tests/sample.mid", True)), ("note-only", make_pattern("note-only")))
+    for name, pattern in inputs:
+        pattern.make_ticks_abs()
+        events = [(index + 1, event.tick, event) for index, track in enumerate(pattern) for event in track]
+        assert [generic(*args) for args in events] == [midi_to_csv_map[type(args[2])](*args) for args in events]
+        before = rate(events, generic)
+        after = rate(events, lambda track, tick, event: midi_to_csv_map[type(event)](track, tick, event))
+        speedup = after / before
+        print(f"{name:<11} write_event {before:12,.0f} lines/s  formatters {after:12,.0f} lines/s  {speedup:4.2f}x")
+
+
+if __name__ == "__main__":
+    main()
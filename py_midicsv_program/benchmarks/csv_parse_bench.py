@@ -0,0 +1,60 @@
+"""Lines per second read by the CSV to MIDI parsers.
+
+Compares csvmidi.parse, which reads every line with csv.reader, with
+csvmidi_stream.parse, which splits unquoted lines itself, on the CSV of
+tests/sample.mid and on a generated note-only file. The tokenizers alone
+are timed as well.
+
+Run from the py_midicsv_program directory:
+
+    python benchmarks/csv_parse_bench.py
+"""
+
+import csv
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dispatch_bench import make_pattern
+
+from py_midicsv import csvmidi, csvmidi_stream
+from py_midicsv.midicsv import parse as midi_to_csv
+
+
+def rate(lines, parse, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse(lines)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(lines) / best
+
+
+def main():
+    pattern = make_pattern("note-only")
+    pattern.make_ticks_abs()
+    generated = [
+        "0, 0, Header, 0, 1, 480\n",
+        "1, 0, Start_track\n",
+        *(f"1, {event.tick}, {'Note_on_c' if event.statusmsg == 0x90 else 'Note_off_c'}, {event.channel}, "
+          f"{event.data[0]}, {event.data[1]}\n" for event in pattern[0][:-1]),
+        f"1, {pattern[0][-1].tick}, End_track\n",
+        "0, 0, End_of_file\n",
+    ]
+    inputs = (("sample.mid", midi_to_csv("tests/sample.mid")), ("note-only", generated))
+    for name, lines in inputs:
+        assert csvmidi_stream.parse(lines) == csvmidi.parse(lines)
+        print(f"{name}:")
+        before = rate(lines, lambda lines: sum(1 for _ in csv.reader(lines, skipinitialspace=True)))
+        after = rate(lines, lambda lines: sum(1 for _ in csvmidi_stream.tokenize(lines)))
+        print(f"  csv.reader         {before:12,.0f} lines/s  tokenize             {after:12,.0f} lines/s")
+        before, after = rate(lines, csvmidi.parse), rate(lines, csvmidi_stream.parse)
+        print(f"  csvmidi.parse      {before:12,.0f} lines/s  csvmidi_stream.parse {after:12,.0f} lines/s  "
+              f"{after / before:4.2f}x")
+
+
+if __name__ == "__main__":
+    main()
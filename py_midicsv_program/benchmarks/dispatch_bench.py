@@ -0,0 +1,102 @@
+"""Event throughput of the generic and table-driven decode/encode paths.
+
+Run from the py_midicsv_program directory:
+
+    python benchmarks/dispatch_bench.py
+"""
+
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from py_midicsv.midi.containers import Pattern, Track
+from py_midicsv.midi.events import ControlChangeEvent, EndOfTrackEvent, MarkerEvent, NoteOffEvent, NoteOnEvent
+from py_midicsv.midi.fileio import FileReader, FileWriter, MappedFileReader
+
+EVENTS = 200000
+
+
+def make_pattern(kind, events=EVENTS, seed=1):
+    rnd = random.Random(seed)
+    track = Track()
+    for i in range(events):
+        tick = rnd.randint(0, 40)
+        channel = rnd.randint(0, 3)
+        if kind == "note-only":
+            cls = NoteOnEvent if i % 2 == 0 else NoteOffEvent
+            track.append(cls(tick=tick, channel=channel, data=[rnd.randint(30, 90), rnd.randint(1, 127)]))
+        elif kind == "cc-heavy":
+            data = [rnd.choice((1, 7, 10, 11)), rnd.randint(0, 127)]
+            track.append(ControlChangeEvent(tick=tick, channel=channel, data=data))
+        else:
+            track.append(MarkerEvent(tick=tick, data=list(b"marker %d" % i)))
+    track.append(EndOfTrackEvent(tick=0))
+    return Pattern(tracks=[track], resolution=480)
+
+
+def encode(pattern):
+    out = io.BytesIO()
+    FileWriter(out).write(pattern)
+    return out.getvalue()
+
+
+def decode_generic(data):
+    """Runs every event through MappedFileReader.parse_midi_event_at."""
+    reader = MappedFileReader()
+    buf = memoryview(data)
+    pattern, pos = reader.parse_file_header_at(buf)
+    for track in pattern:
+        trksz = reader.parse_track_header_at(buf, pos)
+        trackdata, basepos, pos = buf[pos + 8 : pos + 8 + trksz], pos + 8, pos + 8 + trksz
+        reader.RunningStatus = None
+        offset = 0
+        while True:
+            try:
+                event, offset = reader.parse_midi_event_at(trackdata, offset, basepos)
+            except IndexError:
+                break
+            if event:
+                track.append(event)
+    return pattern
+
+
+def rate(func, *args, repeat=3):
+    best = min(timed(func, *args) for _ in range(repeat))
+    return EVENTS / best
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def encode_events(method, events):
+    writer = FileWriter(io.BytesIO())
+    for event in events:
+        method(writer, event)
+
+
+def main():
+    print(f"{'file':<10} {'path':<24} {'events/s':>12}")
+    for kind in ("note-only", "cc-heavy", "meta-heavy"):
+        pattern = make_pattern(kind)
+        data = encode(pattern)
+        events = list(pattern[0])
+        results = [
+            ("decode iterator", rate(lambda: FileReader().read(io.BytesIO(data)))),
+            ("decode generic", rate(decode_generic, data)),
+            ("decode table", rate(lambda: MappedFileReader().read(io.BytesIO(data)))),
+            ("encode generic", rate(encode_events, FileWriter.encode_generic_event, events)),
+            ("encode table", rate(encode_events, FileWriter.encode_midi_event, events)),
+        ]
+        for path, value in results:
+            print(f"{kind:<10} {path:<24} {value:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
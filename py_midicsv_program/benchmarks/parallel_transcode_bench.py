@@ -0,0 +1,51 @@
+"""CSV to MIDI transcoding time with 1, 2, 4 and 8 worker processes.
+
+Transcodes a generated 16-track note-only CSV file with transcode and
+transcode_parallel. The time should fall with the worker count up to the
+number of cores, less the cost of passing the sections to the workers.
+
+Run from the py_midicsv_program directory:
+
+    python benchmarks/parallel_transcode_bench.py
+"""
+
+import io
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from py_midicsv.csvmidi_stream import transcode
+
+TRACKS = 16
+EVENTS = 50000
+
+
+def make_csv(tracks=TRACKS, events=EVENTS):
+    lines = [f"0, 0, Header, 1, {tracks}, 480\n"]
+    for track in range(1, tracks + 1):
+        lines.append(f"{track}, 0, Start_track\n")
+        for i in range(events):
+            kind = "Note_on_c" if i % 2 == 0 else "Note_off_c"
+            lines.append(f"{track}, {i * 10}, {kind}, {track % 16}, {30 + i % 60}, {64 + i % 63}\n")
+        lines.append(f"{track}, {events * 10}, End_track\n")
+    lines.append("0, 0, End_of_file\n")
+    return "".join(lines)
+
+
+def main():
+    text = make_csv()
+    expected = None
+    for workers in (1, 2, 4, 8):
+        out = io.BytesIO()
+        start = time.perf_counter()
+        transcode(io.StringIO(text), out, workers=workers)
+        elapsed = time.perf_counter() - start
+        expected = expected or out.getvalue()
+        assert out.getvalue() == expected
+        print(f"{workers} workers: {elapsed:6.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Time of the CSV string codecs on large text payloads.
+
+as_csv_str escapes a meta event payload for CSV and as_midi_bytes decodes
+it again. Both should grow linearly with the payload size. The per-character
+decoder they replaced is timed on the smaller sizes for comparison; it
+is quadratic and is skipped beyond 1 MB.
+
+Run from the py_midicsv_program directory:
+
+    python benchmarks/text_codec_bench.py
+"""
+
+import os
+import random
+import struct
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from py_midicsv.csv_converters import as_midi_bytes
+from py_midicsv.midi_converters import as_csv_str
+
+SIZES = (1 << 16, 1 << 18, 1 << 20, 1 << 26)
+PREVIOUS_LIMIT = 1 << 20
+
+
+def previous_as_midi_bytes(text):
+    midi_bytes = b""
+    X = iter(text)
+    for c in X:
+        if c == "\\":
+            cc = next(X)
+            if cc == "\\":
+                midi_bytes += struct.pack("B", ord(cc))
+            else:
+                Nstr = cc + next(X) + next(X)
+                midi_bytes += struct.pack("B", int(Nstr, base=8))
+        else:
+            midi_bytes += struct.pack("B", ord(c))
+    return midi_bytes
+
+
+def make_payload(size, seed=1):
+    """Lyric-like text with an escaped byte roughly every 50 characters."""
+    rnd = random.Random(seed)
+    words = [b"la", b"love", b"night", b"\\", b"caf\xe9", b"\x00", b"sing"]
+    chunks = []
+    while sum(map(len, chunks)) < size:
+        chunks.append(b" ".join(rnd.choice(words) for _ in range(1024)))
+    return b" ".join(chunks)[:size]
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    for size in SIZES:
+        payload = make_payload(size)
+        text, encode = timed(as_csv_str, payload)
+        data, decode = timed(as_midi_bytes, text)
+        assert data == payload
+        line = f"{size >> 10:>6} KB  as_csv_str {encode:7.3f}s  as_midi_bytes {decode:7.3f}s"
+        if size <= PREVIOUS_LIMIT:
+            _, previous = timed(previous_as_midi_bytes, text)
+            line += f"  previous as_midi_bytes {previous:8.3f}s"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
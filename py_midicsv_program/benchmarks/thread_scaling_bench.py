@@ -0,0 +1,54 @@
+"""Conversion throughput with 1, 2, 4 and 8 threads.
+
+Each job decodes a MIDI file, writes it back and converts it to CSV. On a
+CPython build with the GIL the threads mostly take turns; on a free-threaded
+build (python3.13t and later) the throughput should grow with the thread count.
+
+Run from the py_midicsv_program directory:
+
+    python benchmarks/thread_scaling_bench.py
+"""
+
+import io
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dispatch_bench import encode, make_pattern
+
+from py_midicsv.midi.fileio import FileWriter, read_midifile
+from py_midicsv.midicsv import parse as midi_to_csv
+
+JOBS = 32
+EVENTS = 20000
+
+
+def convert(data):
+    pattern = read_midifile(io.BytesIO(data), True)
+    out = io.BytesIO()
+    FileWriter(out).write(pattern)
+    return len(out.getvalue()), len(midi_to_csv(io.BytesIO(data)))
+
+
+def main():
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"GIL {'enabled' if gil else 'disabled'}, {os.cpu_count()} CPUs, {JOBS} jobs of {EVENTS} events")
+    kinds = ("note-only", "cc-heavy")
+    inputs = [encode(make_pattern(kind, EVENTS, seed)) for seed in range(JOBS // 2) for kind in kinds]
+    expected = [convert(data) for data in inputs]
+    baseline = None
+    for threads in (1, 2, 4, 8):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            results = list(executor.map(convert, inputs))
+        elapsed = time.perf_counter() - start
+        assert results == expected
+        baseline = baseline or elapsed
+        print(f"{threads} threads: {JOBS / elapsed:8.1f} files/s  speedup {baseline / elapsed:4.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Time from writing a CSV file into a watched directory until its MIDI file is replaced.
+
+Run from the py_midicsv_program directory:
+
+    python benchmarks/watch_latency_bench.py [--poll]
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from py_midicsv.midicsv import parse
+from watch_convert import watch
+
+# Edits timed per file
+EDITS = 20
+
+
+def wait_for_change(path, previous, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            stat = os.stat(path)
+            if (stat.st_mtime_ns, stat.st_ino) != previous:
+                return stat.st_mtime_ns, stat.st_ino
+        except FileNotFoundError:
+            pass
+        time.sleep(0.0005)
+    raise TimeoutError(path)
+
+
+def main():
+    poll = "--poll" in sys.argv
+    lines = parse("tests/sample.mid")
+    note = max(index for index, line in enumerate(lines) if ", Note_on_c, " in line)
+    with tempfile.TemporaryDirectory() as tmp:
+        input_dir, output_dir = os.path.join(tmp, "Input"), os.path.join(tmp, "Output")
+        os.makedirs(input_dir)
+        stop = threading.Event()
+        with contextlib.redirect_stdout(io.StringIO()):
+            thread = threading.Thread(target=watch, args=(input_dir, output_dir), kwargs={"poll": poll, "stop": stop})
+            thread.start()
+            time.sleep(0.5)
+            csv_file, midi_file = os.path.join(input_dir, "song.csv"), os.path.join(output_dir, "song.mid")
+            latencies = []
+            stat = None
+            for edit in range(EDITS):
+                # Change the velocity of the last note, in the last track
+                lines[note] = lines[note].rsplit(", ", 1)[0] + f", {edit % 100 + 1}\n"
+                start = time.perf_counter()
+                with open(csv_file, "w") as f:
+                    f.write("".join(lines))
+                stat = wait_for_change(midi_file, stat)
+                latencies.append(time.perf_counter() - start)
+            stop.set()
+            thread.join()
+    first, latencies = latencies[0], sorted(latencies[1:])
+    print(f"{'poll' if poll else 'inotify'}: {EDITS} edits of a {len(lines)} line CSV")
+    print(f"  new file {first * 1000:.1f} ms")
+    print(f"  edits: median {latencies[len(latencies) // 2] * 1000:.1f} ms, max {latencies[-1] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
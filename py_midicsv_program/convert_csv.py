@@ -5,7 +5,7 @@ import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 # Use the correct import path
-from py_midicsv.csvmidi import parse as csv_to_midi
+from py_midicsv.csvmidi_stream import parse as csv_to_midi
 from py_midicsv.midi.fileio import FileWriter
 
 input_file = "Input/dnbshort copy.csv"
@@ -1,3 +1,4 @@
 from .csvmidi import parse as csv_to_midi  # noqa: F401
-from .midi.fileio import FileReader, FileWriter  # noqa: F401
+from .midi.fileio import FileReader, FileWriter, MappedFileReader  # noqa: F401
 from .midicsv import parse as midi_to_csv  # noqa: F401
+from .midicsv_stream import parse as iter_midi_to_csv  # noqa: F401
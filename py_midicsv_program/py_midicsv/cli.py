@@ -1,20 +1,28 @@
 ### CLI ###
 import click
 
-from .csvmidi import parse as csv_to_midi
-
 ### Local ###
-from .midi.fileio import FileWriter
-from .midicsv import parse as midi_to_csv
+from .csvmidi_stream import SORT_MEMORY_LIMIT, transcode
+from .csvmidi_stream import parse as csv_to_midi
+from .midi.fileio import VALIDATION_MODES, FileWriter, validate_pattern
+from .midicsv_stream import parse as midi_to_csv
 
 
 @click.command()
 @click.option("-n", "--nostrict", is_flag=True, help="Do not fail on parse/validation errors.")
 @click.option("-u", "--usage", is_flag=True, help="Print usage information (NOOP)")
 @click.option("-v", "--verbose", is_flag=True, help="Print debug information (NOOP)")
+@click.option(
+    "--validation",
+    type=click.Choice(VALIDATION_MODES),
+    default="full",
+    show_default=True,
+    help="Check decoded events: per event (full), per track (fast) or not at all.",
+)
+@click.option("-m", "--merge-tracks", is_flag=True, help="List the events of all tracks in one absolute time order.")
 @click.argument("input_file", type=click.File("rb"))
 @click.argument("output_file", type=click.File("w"))
-def midicsv(usage, nostrict, verbose, input_file, output_file):
+def midicsv(usage, nostrict, verbose, validation, merge_tracks, input_file, output_file):
     """Convert MIDI files to CSV files.
 
     midicsv reads a standard MIDI file and decodes it into a CSV file
@@ -31,19 +39,59 @@ def midicsv(usage, nostrict, verbose, input_file, output_file):
     Some arguments are kept for backwards-compatibility with the original midicsv tooling.
     These are marked as NOOP in this command line interface.
     """
-    csv_data = midi_to_csv(input_file, not nostrict)
-    output_file.writelines(csv_data)
+    midi_to_csv(input_file, not nostrict, validation, out=output_file, merge=merge_tracks)
 
 
 @click.command()
 @click.option("-n", "--nostrict", is_flag=True, help="Do not fail on parse/validation errors.")
 @click.option("-u", "--usage", is_flag=True, help="Print usage information (NOOP)")
-@click.option("-v", "--verbose", is_flag=True, help="Print debug information (NOOP)")
+@click.option("-v", "--verbose", is_flag=True, help="Print the number of bytes saved by compression.")
 @click.option("-z", "--strict-csv", is_flag=True, help="Raise exceptions on CSV errors (NOOP)")
-@click.option("-x", "--no-compress", is_flag=True, help="Do not compress status bytes (NOOP)")
+@click.option("-x", "--no-compress", is_flag=True, help="Do not compress status bytes.")
+@click.option(
+    "--note-off-as-note-on",
+    is_flag=True,
+    help="Write Note_off_c as Note_on_c with velocity 0 to compress better.",
+)
+@click.option(
+    "--validation",
+    type=click.Choice(VALIDATION_MODES),
+    default="none",
+    show_default=True,
+    help="Check event values before writing: per event (full) or per track (fast).",
+)
+@click.option("-s", "--sort", is_flag=True, help="Put records in order of track and time before converting.")
+@click.option(
+    "--sort-memory",
+    type=click.IntRange(min=1),
+    default=SORT_MEMORY_LIMIT >> 20,
+    show_default=True,
+    help="Megabytes of records sorted in memory before sorted runs are spilled to temporary files.",
+)
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Encode the tracks in this many processes (without --validation or --sort).",
+)
 @click.argument("input_file", type=click.File("r"))
 @click.argument("output_file", type=click.File("wb"))
-def csvmidi(usage, nostrict, verbose, strict_csv, no_compress, input_file, output_file):
+def csvmidi(
+    usage,
+    nostrict,
+    verbose,
+    strict_csv,
+    no_compress,
+    note_off_as_note_on,
+    validation,
+    sort,
+    sort_memory,
+    jobs,
+    input_file,
+    output_file,
+):
     """Convert CSV files to MIDI files.
 
     csvmidi reads a CSV file in the format written by midicsv and creates
@@ -55,6 +103,16 @@ def csvmidi(usage, nostrict, verbose, strict_csv, no_compress, input_file, outpu
     Some arguments are kept for backwards-compatibility with the original csvmidi tooling.
     These are marked as NOOP in this command line interface.
     """
-    midi_data = csv_to_midi(input_file, not nostrict)
-    writer = FileWriter(output_file)
-    writer.write(midi_data)
+    memory_limit = sort_memory << 20
+    if validation == "none":
+        # Nothing to check, so the records are encoded as they are read
+        writer = transcode(
+            input_file, output_file, not no_compress, note_off_as_note_on, sort, memory_limit, jobs
+        )
+    else:
+        midi_data = csv_to_midi(input_file, sort, memory_limit)
+        validate_pattern(midi_data, validation, not nostrict)
+        writer = FileWriter(output_file, running_status=not no_compress, note_off_as_note_on=note_off_as_note_on)
+        writer.write(midi_data)
+    if verbose:
+        click.echo(f"Running status saved {writer.status_bytes_saved} bytes.", err=True)
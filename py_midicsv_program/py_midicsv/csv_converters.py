@@ -1,24 +1,53 @@
 ### System ###
+import re
 import struct
 
 ### Local ###
 from .midi.events import *
 
 
+# A backslash escape in a CSV string: either \\ or three octal digits
+ESCAPE = re.compile(r"\\(\\|[0-7]{3})")
+ESCAPE_CHARS = {"\\": "\\", **{f"{value:03o}": chr(value) for value in range(256)}}
+
+
 def as_midi_bytes(text):
-    midi_bytes = b""
+    """Decodes the text of a CSV string field into bytes in linear time.
+
+    The text is split on the escapes once, the escapes are replaced by
+    the characters they stand for and the result is encoded in one step.
+    Text that as_midi_bytes_checked would reject (stray backslashes, octal
+    values above 0o377, characters above 0xFF) is passed to it to raise
+    the same error.
+    """
+    decoded = text
+    try:
+        if "\\" in text:
+            parts = ESCAPE.split(text)
+            if any("\\" in literal for literal in parts[::2]):
+                raise ValueError("Malformed escape")
+            parts[1::2] = [ESCAPE_CHARS[escape] for escape in parts[1::2]]
+            decoded = "".join(parts)
+        return decoded.encode("latin-1")
+    except (KeyError, UnicodeEncodeError, ValueError):
+        return as_midi_bytes_checked(text)
+
+
+def as_midi_bytes_checked(text):
+    """Decodes text one character at a time, raising on malformed escapes and characters above 0xFF."""
+    midi_bytes = []
     X = iter(text)
     for c in X:
         if c == "\\":
             cc = next(X)
             if cc == "\\":
-                midi_bytes += struct.pack("B", ord(cc))
+                midi_bytes.append(struct.pack("B", ord(cc)))
             else:
                 Nstr = cc + next(X) + next(X)
-                midi_bytes += struct.pack("B", int(Nstr, base=8))
+                midi_bytes.append(struct.pack("B", int(Nstr, base=8)))
         else:
-            midi_bytes += struct.pack("B", ord(c))
-    return midi_bytes
+            midi_bytes.append(struct.pack("B", ord(c)))
+    return b"".join(midi_bytes)
 
 
 def to_NoteOffEvent(track, time, identifier, line):
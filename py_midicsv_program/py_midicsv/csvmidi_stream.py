@@ -0,0 +1,477 @@
+### System ###
+import csv
+import heapq
+import io
+import math
+import pickle
+import re
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
+
+### Local ###
+from .events import csv_to_midi_map, csv_type_names
+from .midi.containers import Pattern, Track
+from .midi.events import *
+from .midi.fileio import FileWriter, is_seekable
+
+COMMENT_DELIMITERS = ("#", ";")
+
+# Channel messages built directly from their integer fields: event class and number of data bytes.
+# Pitch_bend_c is left to its converter, which splits the value into two bytes.
+CHANNEL_EVENTS = {
+    "Note_off_c": (NoteOffEvent, 2),
+    "Note_on_c": (NoteOnEvent, 2),
+    "Poly_aftertouch_c": (AfterTouchEvent, 2),
+    "Control_c": (ControlChangeEvent, 2),
+    "Program_c": (ProgramChangeEvent, 1),
+    "Channel_aftertouch_c": (ChannelAfterTouchEvent, 1),
+}
+NUMERIC_RECORDS = {*CHANNEL_EVENTS, "Pitch_bend_c"}
+
+# Unquoted Start_track lines, where transcode_parallel splits the input
+START_TRACK = re.compile(r"^ *(?![#;])[^,\"\n]*,[^,\"\n]*,[ \t]*start_track[ \t]*(?:,[^\"\n]*)?$", re.M | re.I | re.A)
+
+# Records sorted in memory before sort_records spills them to temporary files, in bytes
+SORT_MEMORY_LIMIT = 256 << 20
+# Approximate memory held by one buffered record and its sort key, in bytes
+SORT_RECORD_SIZE = 512
+# Records pickled together when a sorted run is spilled
+SPILL_BATCH_RECORDS = 4096
+# Spilled runs kept open at a time; more are merged into one run first
+SPILL_MERGE_RUNS = 64
+
+
+class CSVError(ValueError):
+    """A CSV record that cannot be converted, reported with its line or record number."""
+
+
+def parse(file, sort=False, memory_limit=SORT_MEMORY_LIMIT):
+    """Parses a CSV file into MIDI format.
+
+    Builds the same Pattern as csvmidi.parse, but reads the file through
+    tokenize, so record type names are matched case-insensitively and
+    errors, including records before the first Start_track, raise
+    CSVError with the line they occur on.
+
+    Args:
+        file: A string giving the path to a file on disk or
+              an open file-like object.
+        sort: If set, the records are put in order with sort_records first,
+              using at most about memory_limit bytes of memory.
+
+    Returns:
+        A Pattern() object containing the byte-representations as parsed from
+        the input file.
+    """
+    if isinstance(file, str):
+        with open(file) as f:
+            return parse(f, sort, memory_limit)
+
+    pattern = Pattern(tick_relative=False)
+    records = sort_records(tokenize(file), memory_limit) if sort else tokenize(file)
+    lineno = 0
+    track = None
+    try:
+        for lineno, tr, time, identifier, fields in records:
+            if identifier in CHANNEL_EVENTS:
+                if track is None:
+                    raise CSVError(f"Line {lineno}: record before Start_track")
+                event_class, length = CHANNEL_EVENTS[identifier]
+                data = [int(fields[1]), int(fields[2])] if length == 2 else [int(fields[1])]
+                track.append(event_class(time, int(fields[0]), data=data))
+            elif identifier == "Header":
+                pattern.format = int(fields[0])
+                pattern.resolution = int(fields[2])
+            elif identifier == "End_of_file":
+                continue
+            elif identifier == "Start_track":
+                track = Track(tick_relative=False)
+                pattern.append(track)
+            elif track is None:
+                raise CSVError(f"Line {lineno}: record before Start_track")
+            else:
+                track.append(csv_to_midi_map[identifier](tr, time, identifier, fields))
+    except CSVError:
+        raise
+    except (KeyError, IndexError, ValueError) as error:
+        raise CSVError(f"Line {lineno}: {error!r}") from error
+    pattern.make_ticks_rel()
+    return pattern
+
+
+def transcode(
+    file,
+    out,
+    running_status=None,
+    note_off_as_note_on=False,
+    sort=False,
+    memory_limit=SORT_MEMORY_LIMIT,
+    workers=None,
+):
+    """Converts a CSV file into a MIDI file without building a Pattern.
+
+    Records are encoded as they are read: channel messages straight from
+    their fields, other records through their csv_to_midi_map converter
+    one at a time. Each track is written out once the next Start_track or
+    the end of the input is reached, so memory is bounded by the largest
+    track. The output is the same as writing the result of parse with a
+    FileWriter; if out cannot seek, the track count in the MThd chunk is
+    taken from the Header record instead of counted, and CSVError is
+    raised if that is not a number.
+
+    Args:
+        file: A string giving the path to a file on disk or
+              an open file-like object.
+        out: A string giving the path of the MIDI file to write or an open
+             binary file-like object.
+        running_status, note_off_as_note_on: As for FileWriter.
+        sort, memory_limit: As for parse. Sorting holds the records back
+                            until the whole input is read.
+        workers: If more than 1, the tracks are encoded in a pool of that
+                 many processes, see transcode_parallel. This holds the
+                 whole CSV text in memory instead of the largest track.
+                 Not used together with sort.
+
+    Returns:
+        The FileWriter used, for its status_bytes_saved.
+    """
+    if isinstance(file, str):
+        with open(file) as f:
+            return transcode(f, out, running_status, note_off_as_note_on, sort, memory_limit, workers)
+    if isinstance(out, str):
+        with open(out, "wb") as f:
+            return transcode(file, f, running_status, note_off_as_note_on, sort, memory_limit, workers)
+    if workers and workers > 1 and not sort:
+        return transcode_parallel(file, out, workers, running_status, note_off_as_note_on)
+
+    writer = FileWriter(out, running_status, note_off_as_note_on)
+    header = {}
+    start = out.tell() if is_seekable(out) else None
+    records = sort_records(tokenize(file), memory_limit) if sort else tokenize(file)
+    header["counted"] = write_records(records, writer, header)
+    if not header["counted"]:
+        write_file_header(writer, header)
+    if start is not None:
+        end = out.tell()
+        out.seek(start)
+        write_file_header(writer, header, counted=True)
+        out.seek(end)
+    return writer
+
+
+def transcode_parallel(file, out, workers, running_status=None, note_off_as_note_on=False):
+    """Converts a CSV file into a MIDI file, encoding its tracks in a pool of worker processes.
+
+    The whole input is read into memory, from a file or any iterable of
+    lines, and split into sections by split_sections, which are handed to
+    transcode_section. The MTrk chunks are written in track order as they
+    come back, with at most two sections per worker in flight. Errors
+    report the line numbers of the whole input. Input that cannot be
+    split, or has only one track, is converted by transcode instead.
+    The output is the same as that of transcode.
+    """
+    if isinstance(file, str):
+        with open(file) as f:
+            return transcode_parallel(f, out, workers, running_status, note_off_as_note_on)
+    if isinstance(out, str):
+        with open(out, "wb") as f:
+            return transcode_parallel(file, f, workers, running_status, note_off_as_note_on)
+
+    text = file.read() if hasattr(file, "read") else "".join(file)
+    sections, lines = split_sections(text) or ((), ())
+    if len(sections) < 3:
+        return transcode(io.StringIO(text), out, running_status=running_status, note_off_as_note_on=note_off_as_note_on)
+
+    writer = FileWriter(out, running_status, note_off_as_note_on)
+    start = out.tell() if is_seekable(out) else None
+    # Records before the first Start_track give the MThd chunk, as in transcode
+    chunks, tracks, saved, header = transcode_section(sections[0], 1, running_status, note_off_as_note_on)
+    write_file_header(writer, header)
+    out.write(chunks)
+    header["counted"], writer.status_bytes_saved = tracks, saved
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for section, first_line in chain(zip(sections[1:], lines[1:]), [(None, None)]):
+            if section is not None:
+                pending.append(
+                    executor.submit(transcode_section, section, first_line, running_status, note_off_as_note_on)
+                )
+            while pending and (section is None or len(pending) >= 2 * workers):
+                try:
+                    chunks, tracks, saved, found = pending.popleft().result()
+                except BaseException:
+                    for future in pending:
+                        future.cancel()
+                    raise
+                out.write(chunks)
+                header.update(found)
+                header["counted"] += tracks
+                writer.status_bytes_saved += saved
+    if start is not None:
+        end = out.tell()
+        out.seek(start)
+        write_file_header(writer, header, counted=True)
+        out.seek(end)
+    return writer
+
+
+def split_sections(text):
+    """Splits CSV text before each of its Start_track records.
+
+    Returns the sections and the line number each one starts on, or None
+    if there is no Start_track or quoted fields may span a section boundary.
+    """
+    offsets = [0, *(match.start() for match in START_TRACK.finditer(text)), len(text)]
+    sections = [text[begin:end] for begin, end in zip(offsets, offsets[1:])]
+    if len(sections) < 2 or any(section.count('"') % 2 for section in sections):
+        return None
+    lines = [1]
+    for section in sections[:-1]:
+        lines.append(lines[-1] + section.count("\n"))
+    return sections, lines
+
+
+def transcode_cached(text, out, cache=None, running_status=None, note_off_as_note_on=False):
+    """Converts CSV text into a MIDI file, reusing the tracks encoded for an earlier version of it.
+
+    cache is the dictionary returned by the previous call for the same
+    file, with the same settings. It maps the text of each section (see
+    split_sections) to its transcode_section result, so only sections
+    that changed since are encoded again. The output is the same as that
+    of transcode_parallel. Returns the dictionary for the next call; text
+    that cannot be split is converted by transcode and gives an empty one.
+    """
+    split = split_sections(text)
+    if split is None:
+        transcode(io.StringIO(text), out, running_status=running_status, note_off_as_note_on=note_off_as_note_on)
+        return {}
+    cache = cache or {}
+    results = {}
+    for section, first_line in zip(*split):
+        if section not in results:
+            results[section] = cache.get(section) or transcode_section(
+                section, first_line, running_status, note_off_as_note_on
+            )
+    writer = FileWriter(out, running_status, note_off_as_note_on)
+    header = {"counted": 0}
+    for section in split[0]:
+        tracks, saved, found = results[section][1:]
+        header.update(found)
+        header["counted"] += tracks
+        writer.status_bytes_saved += saved
+    write_file_header(writer, header, counted=is_seekable(out))
+    for section in split[0]:
+        out.write(results[section][0])
+    return results
+
+
+def transcode_section(text, first_line, running_status=None, note_off_as_note_on=False):
+    """Encodes the tracks in one section of a CSV file into MTrk chunks.
+
+    Runs in the worker processes of transcode_parallel. first_line is the
+    line number of the first line of text in the whole input. Returns the
+    chunks, the number of tracks, the status bytes saved and the values of
+    any Header record in the section.
+    """
+    out = io.BytesIO()
+    writer = FileWriter(out, running_status, note_off_as_note_on)
+    header = {}
+    tracks = write_records(tokenize(io.StringIO(text), first_line), writer, header, write_header=False)
+    return out.getvalue(), tracks, writer.status_bytes_saved, header
+
+
+def write_records(records, writer, header, write_header=True):
+    """Encodes tokenized records with writer and returns the number of tracks.
+
+    Header records are stored in header. With write_header, the MThd chunk
+    is written from it when the first track starts.
+    """
+    tracks = lineno = 0
+    try:
+        for lineno, tr, time, identifier, fields in records:
+            if identifier in CHANNEL_EVENTS:
+                if not tracks:
+                    raise CSVError(f"Line {lineno}: record before Start_track")
+                event_class, length = CHANNEL_EVENTS[identifier]
+                data = (int(fields[1]), int(fields[2])) if length == 2 else (int(fields[1]),)
+                writer.write_channel_message(time - last, event_class.statusmsg | int(fields[0]), data)
+                last = time
+            elif identifier == "Header":
+                header["format"], header["resolution"] = int(fields[0]), int(fields[2])
+                try:
+                    header["tracks"] = int(fields[1])
+                except ValueError:
+                    # csvmidi.parse ignores the track count; only unseekable outputs need it, see write_file_header
+                    header["tracks"], header["tracks_line"] = None, lineno
+            elif identifier == "End_of_file":
+                continue
+            elif identifier == "Start_track":
+                if tracks:
+                    writer.end_track()
+                elif write_header:
+                    write_file_header(writer, header)
+                tracks += 1
+                writer.begin_track()
+                last = 0
+            elif not tracks:
+                raise CSVError(f"Line {lineno}: record before Start_track")
+            else:
+                event = csv_to_midi_map[identifier](tr, time, identifier, fields)
+                event.tick = time - last
+                writer.write_event(event)
+                last = time
+    except CSVError:
+        raise
+    except (KeyError, IndexError, ValueError) as error:
+        raise CSVError(f"Line {lineno}: {error!r}") from error
+    if tracks:
+        writer.end_track()
+    return tracks
+
+
+def write_file_header(writer, header, counted=False):
+    """Writes the MThd chunk from the values of a Header record, with the track count it states or as counted.
+
+    A stated track count that is not a number is written as 0 to outputs
+    that can seek, where it is replaced by the counted one later, and
+    raises CSVError for others.
+    """
+    pattern = Pattern(resolution=header.get("resolution", 220), format=header.get("format", 1))
+    tracks = header.get("counted" if counted else "tracks", 0)
+    if tracks is None:
+        if not is_seekable(writer.file):
+            raise CSVError(
+                f"Line {header['tracks_line']}: Header track count is not a number, "
+                "and the tracks cannot be counted for an output that cannot seek"
+            )
+        tracks = 0
+    writer.write_file_header(pattern, tracks)
+
+
+def sort_records(records, memory_limit=SORT_MEMORY_LIMIT):
+    """Yields tokenized records in order of track and time.
+
+    Records that tie keep their input order. Start_track comes first in
+    its track and End_track last, the Header record goes before all tracks
+    and End_of_file after them. Like csvmidi.parse, tracks are told apart
+    by the Start_track record they follow and not by their track column:
+    the track field of the yielded records is the number of Start_track
+    records up to and including theirs.
+
+    Input that is already in order is passed through without sorting.
+    Otherwise the records are sorted in memory while they fit in about
+    memory_limit bytes; beyond that, sorted runs of that size are spilled
+    to temporary files and merged at the end.
+    """
+    capacity = max(1, memory_limit // SORT_RECORD_SIZE)
+    runs = []
+    try:
+        buffer, ordered, last = [], True, None
+        section = 0
+        for lineno, _, time, identifier, fields in records:
+            if identifier == "Start_track":
+                section += 1
+            record = lineno, section, time, identifier, fields
+            key = sort_key(record)
+            if ordered and last is not None and key < last:
+                ordered = False
+            last = key
+            buffer.append(record)
+            if len(buffer) >= capacity:
+                if not ordered:
+                    buffer.sort(key=sort_key)
+                runs.append((0, spill_run(buffer)))
+                buffer, ordered, last = [], True, None
+                # Merge the last runs once there are SPILL_MERGE_RUNS of the same level
+                while len(runs) >= SPILL_MERGE_RUNS and runs[-SPILL_MERGE_RUNS][0] == runs[-1][0]:
+                    level, tail = runs[-1][0], [run for _, run in runs[-SPILL_MERGE_RUNS:]]
+                    del runs[-SPILL_MERGE_RUNS:]
+                    runs.append((level + 1, spill_run(merge_runs(tail))))
+                    for run in tail:
+                        run.close()
+        if not ordered:
+            buffer.sort(key=sort_key)
+        if runs:
+            yield from merge_runs([run for _, run in runs], buffer)
+        else:
+            yield from buffer
+    finally:
+        for _, run in runs:
+            run.close()
+
+
+def sort_key(record):
+    _, tr, time, identifier, _ = record
+    if identifier == "Start_track":
+        return tr, 0, 0
+    if identifier == "End_track":
+        return tr, 2, time
+    if identifier == "Header":
+        return -1, 0, 0
+    if identifier == "End_of_file":
+        return math.inf, 0, 0
+    return tr, 1, time
+
+
+def merge_runs(runs, buffer=()):
+    # Runs come in input order and heapq.merge takes ties from the earlier run first
+    return heapq.merge(*(load_run(run) for run in runs), buffer, key=sort_key)
+
+
+def spill_run(records):
+    run = tempfile.TemporaryFile()
+    records = iter(records)
+    batch = list(islice(records, SPILL_BATCH_RECORDS))
+    while batch:
+        pickle.dump(batch, run, pickle.HIGHEST_PROTOCOL)
+        batch = list(islice(records, SPILL_BATCH_RECORDS))
+    return run
+
+
+def load_run(run):
+    run.seek(0)
+    while True:
+        try:
+            batch = pickle.load(run)
+        except EOFError:
+            return
+        yield from batch
+
+
+def tokenize(file, first_line=1):
+    """Splits CSV lines into (line number, track, time, type name, parameters) records.
+
+    Lines without a double quote are split on commas directly; only lines
+    that contain one are read with the csv module, which also joins quoted
+    fields that span lines. Type names are matched case-insensitively and
+    returned in their canonical spelling. The parameters of channel messages
+    are left unstripped, since int() ignores surrounding whitespace; those of
+    other records are stripped like csv.reader(skipinitialspace=True) does.
+    Blank lines and comments are skipped. Lines are numbered from first_line.
+    """
+    names = csv_type_names
+    lines = iter(file)
+    lineno = first_line - 1
+    for line in lines:
+        lineno += 1
+        start = lineno
+        if '"' in line:
+            reader = csv.reader(chain((line,), lines), skipinitialspace=True)
+            fields = next(reader, [])
+            lineno += reader.line_num - 1
+            if not fields or fields[0].startswith(COMMENT_DELIMITERS):
+                continue
+        elif not line or line[0] in "\r\n" or (line[0] in " #;" and line.lstrip(" ").startswith(COMMENT_DELIMITERS)):
+            continue
+        else:
+            fields = line.split(",")
+        try:
+            identifier = names[fields[2].strip().lower()]
+            tr, time = int(fields[0]), int(fields[1])
+        except (KeyError, IndexError, ValueError) as error:
+            raise CSVError(f"Line {start}: {error!r}") from error
+        if identifier not in NUMERIC_RECORDS and '"' not in line:
+            fields = [field.lstrip(" ") for field in line.rstrip("\r\n").split(",")]
+        yield start, tr, time, identifier, fields[3:]
@@ -1,4 +1,5 @@
 from .csv_converters import *
+from .midi.compact import COMPACT_EVENTS
 from .midi.events import *
 from .midi_converters import *
 
@@ -32,6 +33,7 @@ midi_to_csv_map = {
     SysexEvent: from_SysexEvent,
     SysexF7Event: from_SysexF7Event,
 }
+midi_to_csv_map.update({COMPACT_EVENTS[cls]: convert for cls, convert in list(midi_to_csv_map.items())})
 
 csv_to_midi_map = {
     "Note_off_c": to_NoteOffEvent,
@@ -63,3 +65,41 @@ csv_to_midi_map = {
     "System_exclusive": to_SysexEvent,
     "System_exclusive_F7": to_SysexF7Event,
 }
+
+# Canonical record type names by their lower-case spelling, as type names are case-insensitive
+csv_type_names = {name.lower(): name for name in (*csv_to_midi_map, "Header", "Start_track", "End_of_file")}
+
+# Number of parameters taken by each record type; None where a byte count gives the number of bytes that follow
+csv_parameter_counts = {
+    "Header": 3,
+    "Start_track": 0,
+    "End_of_file": 0,
+    "Note_off_c": 3,
+    "Note_on_c": 3,
+    "Poly_aftertouch_c": 3,
+    "Control_c": 3,
+    "Program_c": 2,
+    "Channel_aftertouch_c": 2,
+    "Pitch_bend_c": 2,
+    "Sequence_number": 1,
+    "Program_name_t": 1,
+    "Text_t": 1,
+    "Copyright_t": 1,
+    "Title_t": 1,
+    "Instrument_name_t": 1,
+    "Lyric_t": 1,
+    "Marker_t": 1,
+    "Cue_point_t": 1,
+    "Channel_prefix": 1,
+    "MIDI_port": 1,
+    "End_track": 0,
+    "Device_name_t": 1,
+    "Loop_track": 0,
+    "Tempo": 1,
+    "SMPTE_offset": 5,
+    "Time_signature": 4,
+    "Key_signature": 2,
+    "Sequencer_specific": None,
+    "System_exclusive": None,
+    "System_exclusive_F7": None,
+}
@@ -0,0 +1,135 @@
+### System ###
+import contextlib
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+# Name of the manifest file kept in the output directory
+MANIFEST_NAME = ".midicsv-manifest.json"
+
+# Increase when the manifest layout changes; older manifests are then ignored
+MANIFEST_VERSION = 1
+
+# Settings of the csvmidi conversion done by batch_convert.py, watch_convert.py and midicsvPlug, which must all
+# write the same bytes for the same input since they take each other's outputs as current
+CSVMIDI_SETTINGS = {"converter": "csvmidi", "running_status": True, "note_off_as_note_on": False}
+
+# Bytes read at a time while hashing a file
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def hash_file(path):
+    """Returns the SHA-256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def stat_key(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+@contextlib.contextmanager
+def atomic_open(path, mode="wb"):
+    """Opens a temporary file next to path that replaces path once it is closed without an error.
+
+    Readers never see a partly written file, and an interrupted write
+    leaves the previous file in place.
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    fd, temp = tempfile.mkstemp(dir=directory, prefix=f".{name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode) as f:
+            yield f
+        os.replace(temp, path)
+    except BaseException:
+        os.unlink(temp)
+        raise
+
+
+class Manifest:
+    """
+    Records which outputs were converted from which inputs, in a JSON
+    file in the output directory.
+
+    Outputs are found by a key made of the input's content hash and a
+    hash of the converter settings, so an input converts again only when
+    its content or the settings change, wherever it is and whatever it
+    is called. Hashes are stored with the size and modification time of
+    the file they were taken from, and a file whose size and time still
+    match is not read again.
+    """
+
+    def __init__(self, output_dir, settings=CSVMIDI_SETTINGS):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self.settings_hash = hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:16]
+        self.inputs = {}
+        self.outputs = {}
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == MANIFEST_VERSION:
+            self.inputs = data["inputs"]
+            self.outputs = data["outputs"]
+
+    def hash_input(self, path):
+        """Returns the content hash of an input, reading it only if it changed since it was last hashed."""
+        path = os.path.abspath(path)
+        key = stat_key(path)
+        cached = self.inputs.get(path)
+        if cached is None or cached[:2] != key:
+            cached = self.inputs[path] = [*key, hash_file(path)]
+        return cached[2]
+
+    def key(self, input_path):
+        return f"{self.hash_input(input_path)}-{self.settings_hash}"
+
+    def is_current(self, output, recorded):
+        """Tells if an output file still has the content it was recorded with."""
+        path = os.path.join(self.output_dir, output)
+        try:
+            key = stat_key(path)
+        except OSError:
+            return False
+        if recorded[:2] != key:
+            if hash_file(path) != recorded[2]:
+                return False
+            recorded[:2] = key
+        return True
+
+    def lookup(self, key, output_path=None, pattern=None):
+        """Returns the path of an up-to-date output converted under key, or None.
+
+        With output_path, only that output is considered. With pattern, a
+        regular expression, only outputs whose path relative to the output
+        directory matches it as a whole are.
+        """
+        outputs = self.outputs.get(key, {})
+        if output_path is not None:
+            output = os.path.relpath(output_path, self.output_dir)
+            outputs = {output: outputs[output]} if output in outputs else {}
+        if pattern is not None:
+            outputs = {output: recorded for output, recorded in outputs.items() if re.fullmatch(pattern, output)}
+        for output, recorded in outputs.items():
+            if self.is_current(output, recorded):
+                return os.path.join(self.output_dir, output)
+        return None
+
+    def record(self, key, output_path):
+        """Records output_path as converted under key."""
+        output = os.path.relpath(output_path, self.output_dir)
+        self.outputs.setdefault(key, {})[output] = [*stat_key(output_path), hash_file(output_path)]
+
+    def save(self):
+        """Writes the manifest, replacing the previous one in a single rename."""
+        data = {"version": MANIFEST_VERSION, "inputs": self.inputs, "outputs": self.outputs}
+        with atomic_open(self.path, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
@@ -0,0 +1,235 @@
+### System ###
+import io
+from struct import Struct, error
+
+### Local ###
+from .compact import COMPACT_EVENTS
+from .containers import Pattern, Track
+from .events import EventRegistry
+from .fileio import ParseError, is_seekable, map_midifile
+
+# The layout of an event archive is described in doc/archive-format.md
+MAGIC = b"PYMIDARC"
+VERSION = 1
+
+# magic, version, format, resolution, flags, tracks, row size, events,
+# rows offset, index offset, heap offset, heap size
+HEADER = Struct("<8sHHHHIIQQQQQ")
+
+# One row per event, laid out like columnar.EVENT_DTYPE: abs_tick, track,
+# status, channel, data1, data2, offset, length
+ROW = Struct("<qHBBBBqI")
+
+# The track index holds the first row of every track and the row count
+INDEX = Struct("<Q")
+
+# Header flag set when the pattern was read from a file using running status
+FLAG_RUNNING_STATUS = 1
+
+
+def pack_event(event, abstime, index, heap):
+    """Packs one event into a row, appending its payload to heap."""
+    status = event.statusmsg
+    data = event.data
+    if status == 0xFF:
+        row = ROW.pack(abstime, index, status, 0, event.metacommand, 0, len(heap), len(data))
+    elif status >= 0xF0:
+        row = ROW.pack(abstime, index, status, event.channel, 0, 0, len(heap), len(data))
+    elif len(data) == event.length:
+        return ROW.pack(abstime, index, status, event.channel, data[0], data[1] if len(data) > 1 else 0, 0, 0)
+    else:
+        # Channel events with an unusual number of data bytes keep them in the heap
+        row = ROW.pack(abstime, index, status, event.channel, 0, 0, len(heap), len(data))
+    heap += bytes(data)
+    return row
+
+
+def write_archive(file, pattern):
+    """Writes a Pattern to file, a path or a binary file, as an event archive.
+
+    Rows are written track by track as they are packed; text and sysex
+    payloads are collected in memory and written after them. Unseekable
+    files get the archive built in memory first.
+    """
+    if type(file) in (str, bytes):
+        with open(file, "wb") as out:
+            return write_archive(out, pattern)
+    if not is_seekable(file):
+        buf = io.BytesIO()
+        write_archive(buf, pattern)
+        file.write(buf.getbuffer())
+        return
+    start = file.tell()
+    file.write(bytes(HEADER.size))
+    heap = bytearray()
+    starts = [0]
+    for index, track in enumerate(pattern):
+        rows = bytearray()
+        abstime = 0
+        for event in track:
+            abstime = abstime + event.tick if pattern.tick_relative else event.tick
+            try:
+                rows += pack_event(event, abstime, index, heap)
+            except (error, ValueError) as e:
+                raise ValueError(f"Cannot store {type(event).__name__} at tick {abstime} in track {index}: {e}") from e
+        file.write(rows)
+        starts.append(starts[-1] + len(rows) // ROW.size)
+    rows_end = HEADER.size + starts[-1] * ROW.size
+    # The index is aligned to 8 bytes so that it can be read with whole-word loads
+    padding = -rows_end % 8
+    file.write(bytes(padding) + b"".join(INDEX.pack(row) for row in starts))
+    index_offset = rows_end + padding
+    heap_offset = index_offset + len(starts) * INDEX.size
+    file.write(heap)
+    end = file.tell()
+    flags = FLAG_RUNNING_STATUS if pattern.useRunningStatus else 0
+    file.seek(start)
+    file.write(
+        HEADER.pack(
+            MAGIC,
+            VERSION,
+            pattern.format,
+            pattern.resolution,
+            flags,
+            len(starts) - 1,
+            ROW.size,
+            starts[-1],
+            HEADER.size,
+            index_offset,
+            heap_offset,
+            len(heap),
+        )
+    )
+    file.seek(end)
+
+
+class EventArchive:
+    """
+    An event archive mapped into memory. Opening it reads only the header
+    and the track index; rows and payloads are decoded when they are used.
+
+    Iterating yields (track_index, abs_tick, event) tuples in file order
+    like EventStream, so midicsv_stream.format_lines turns an archive into
+    CSV lines. to_pattern() rebuilds the Pattern and columnar() returns the
+    rows as a ColumnarPattern without copying them.
+    """
+
+    def __init__(self, buf):
+        self.buf = buf
+        if len(buf) < HEADER.size:
+            raise ParseError("Event archive is truncated")
+        fields = HEADER.unpack_from(buf)
+        magic, version, self.format, self.resolution, flags, tracks, row_size, events = fields[:8]
+        rows_offset, index_offset, heap_offset, heap_size = fields[8:]
+        if magic != MAGIC:
+            raise ParseError(f"Bad header in event archive (expected {MAGIC!r})")
+        if version != VERSION or row_size != ROW.size:
+            raise ParseError(f"Unsupported event archive version {version} with {row_size} byte rows")
+        index_end = index_offset + (tracks + 1) * INDEX.size
+        if len(buf) < max(rows_offset + events * ROW.size, index_end, heap_offset + heap_size):
+            raise ParseError("Event archive is truncated")
+        self.useRunningStatus = bool(flags & FLAG_RUNNING_STATUS)
+        self.events = events
+        self.rows_offset = rows_offset
+        self.heap_offset = heap_offset
+        view = memoryview(buf)
+        self.rows = view[rows_offset : rows_offset + events * ROW.size]
+        self.heap = view[heap_offset : heap_offset + heap_size]
+        self.track_starts = [row for row, in INDEX.iter_unpack(view[index_offset:index_end])]
+
+    def __len__(self):
+        return len(self.track_starts) - 1
+
+    def __repr__(self):
+        return (
+            f"EventArchive(format={self.format!r}, resolution={self.resolution!r}, "
+            f"tracks={len(self)}, events={self.events})"
+        )
+
+    def __iter__(self):
+        for index in range(len(self)):
+            abstime = 0
+            for event in self.iter_track(index):
+                abstime += event.tick
+                yield index, abstime, event
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def iter_track(self, index, compact=False):
+        """Yields the events of one track with relative ticks, as in a decoded Track."""
+        metas = EventRegistry.MetaEvents
+        classes = EventRegistry.Events
+        heap = self.heap
+        start, end = self.track_starts[index], self.track_starts[index + 1]
+        previous = 0
+        for abstime, _, status, channel, data1, data2, offset, length in ROW.iter_unpack(
+            self.rows[start * ROW.size : end * ROW.size]
+        ):
+            tick = abstime - previous
+            previous = abstime
+            if status == 0xFF:
+                cls = metas[data1]
+                data = heap[offset : offset + length]
+                if compact:
+                    yield COMPACT_EVENTS[cls](tick, data)
+                else:
+                    yield cls(tick=tick, data=list(data))
+                continue
+            cls = classes[status]
+            if length or status >= 0xF0:
+                data = heap[offset : offset + length]
+            else:
+                data = (data1, data2)[: cls.length]
+            if compact:
+                yield COMPACT_EVENTS[cls](tick, channel, data)
+            else:
+                yield cls(tick=tick, channel=channel, data=list(data))
+
+    def track(self, index, compact=False):
+        return Track(self.iter_track(index, compact))
+
+    def to_pattern(self, compact=False):
+        """Rebuilds the Pattern that was written, with relative ticks."""
+        pattern = Pattern(
+            tracks=[self.track(index, compact) for index in range(len(self))],
+            resolution=self.resolution,
+            format=self.format,
+        )
+        pattern.useRunningStatus = self.useRunningStatus
+        return pattern
+
+    def columnar(self):
+        """Returns the archive as a ColumnarPattern whose arrays are views into the mapped file."""
+        from .columnar import EVENT_DTYPE, ColumnarPattern, np
+
+        events = np.frombuffer(self.buf, dtype=EVENT_DTYPE, count=self.events, offset=self.rows_offset)
+        payload = np.frombuffer(self.buf, dtype=np.uint8, count=len(self.heap), offset=self.heap_offset)
+        return ColumnarPattern(
+            events, payload, list(self.track_starts), self.format, self.resolution, self.useRunningStatus
+        )
+
+    def close(self):
+        """Releases the views into the mapped file and unmaps it.
+
+        A mapping that arrays returned by columnar() still use is left to
+        be unmapped once they are gone.
+        """
+        self.rows.release()
+        self.heap.release()
+        try:
+            if hasattr(self.buf, "close"):
+                self.buf.close()
+        except BufferError:
+            pass
+
+
+def read_archive(file):
+    """Opens an event archive, a path or a binary file, through a memory map."""
+    if type(file) in (str, bytes):
+        with open(file, "rb") as inp:
+            return read_archive(inp)
+    return EventArchive(map_midifile(file))
@@ -0,0 +1,276 @@
+### System ###
+from struct import Struct
+
+try:
+    import numpy as np
+except ImportError as e:
+    raise ImportError("py_midicsv.midi.columnar requires numpy") from e
+
+### Local ###
+from .containers import Pattern
+from .events import EventRegistry, MetaEvent, SysexEvent
+from .fileio import FileWriter, MappedFileReader, check_each_event, map_midifile
+from .util import read_varlen_at, write_varlen
+
+# One row per event. Channel messages keep the upper nibble of the status
+# byte in status and the lower one in channel. Meta events have status 0xFF
+# and the meta command in data1; meta and sysex payloads are stored in a
+# separate buffer and referenced by offset and length.
+EVENT_DTYPE = np.dtype(
+    [
+        ("abs_tick", "<i8"),
+        ("track", "<u2"),
+        ("status", "u1"),
+        ("channel", "u1"),
+        ("data1", "u1"),
+        ("data2", "u1"),
+        ("offset", "<i8"),
+        ("length", "<u4"),
+    ]
+)
+
+ROW = Struct("<qHBBBBqI")
+
+# Payload length of each fixed-size meta event by meta command, -1 otherwise
+META_LENGTHS = np.full(256, -1, dtype=np.int64)
+for command, cls in EventRegistry.MetaEvents.items():
+    if isinstance(cls.length, int):
+        META_LENGTHS[command] = cls.length
+
+
+class ColumnarPattern:
+    """
+    A MIDI file decoded into one structured NumPy array of events in
+    file order, plus a byte buffer holding meta and sysex payloads.
+    """
+
+    def __init__(self, events, payload, track_starts, format=1, resolution=220, useRunningStatus=True):
+        self.events = events
+        self.payload = payload
+        self.track_starts = track_starts
+        self.format = format
+        self.resolution = resolution
+        self.useRunningStatus = useRunningStatus
+
+    def __len__(self):
+        return len(self.track_starts) - 1
+
+    def __repr__(self):
+        return (
+            f"ColumnarPattern(format={self.format!r}, resolution={self.resolution!r}, "
+            f"tracks={len(self)}, events={len(self.events)})"
+        )
+
+    def track(self, index):
+        """Returns the rows of one track as a view into events."""
+        return self.events[self.track_starts[index] : self.track_starts[index + 1]]
+
+    def get_payload(self, row):
+        return bytes(self.payload[row["offset"] : row["offset"] + row["length"]])
+
+    def get_event(self, row):
+        """Rebuilds the event stored in row, with its absolute tick."""
+        status = int(row["status"])
+        tick = int(row["abs_tick"])
+        if status == 0xFF:
+            cls = EventRegistry.MetaEvents[int(row["data1"])]
+            return cls(tick=tick, data=list(self.get_payload(row)))
+        cls = EventRegistry.Events[status]
+        if status >= 0xF0:
+            return cls(tick=tick, data=list(self.get_payload(row)))
+        data = [int(row["data1"]), int(row["data2"])][: cls.length]
+        return cls(tick=tick, channel=int(row["channel"]), data=data)
+
+
+def read_midifile_columnar(midifile, strict=True, validation="full"):
+    if type(midifile) in (str, bytes):
+        with open(midifile, "rb") as inp:
+            return read_midifile_columnar(inp, strict, validation)
+    reader = MappedFileReader(validation=validation)
+    buf = map_midifile(midifile)
+    header, pos = reader.parse_file_header_at(buf, strict)
+    rows = bytearray()
+    payload = bytearray()
+    track_starts = [0]
+    for index in range(len(header)):
+        trksz = reader.parse_track_header_at(buf, pos)
+        pos += 8
+        parse_track_columns(reader, memoryview(buf)[pos : pos + trksz], index, rows, payload, pos, strict)
+        pos += trksz
+        track_starts.append(len(rows) // ROW.size)
+    events = np.frombuffer(bytes(rows), dtype=EVENT_DTYPE)
+    table = ColumnarPattern(
+        events, bytes(payload), track_starts, header.format, header.resolution, reader.useRunningStatus
+    )
+    if validation == "fast":
+        check_columns(table, strict)
+    return table
+
+
+def check_columns(table, strict=True):
+    """Range-checks a decoded table with whole-column operations.
+
+    This is the validation="fast" check for the columnar reader. Only the
+    rows flagged by the column checks are rebuilt as events and checked
+    one by one, which reports them the same way as validation="full".
+    """
+    events = table.events
+    status = events["status"]
+    expected = META_LENGTHS[events["data1"]]
+    suspect = (status < 0xF0) & ((events["data1"] | events["data2"]) > 0x7F)
+    suspect |= (status == 0xFF) & (expected >= 0) & (events["length"] != expected)
+    for row in events[suspect]:
+        check_each_event([table.get_event(row)], strict, f" in track {row['track']} at tick {row['abs_tick']}")
+
+
+def parse_track_columns(reader, trackdata, index, rows, payload, basepos=0, strict=True):
+    """Decodes one MTrk chunk body into packed rows.
+
+    Well-formed channel messages are read by reader.channel_message_at,
+    as in MappedFileReader, and packed without creating event objects.
+    Everything else is decoded by reader.parse_midi_event_at so
+    that running status, warnings and validation behave exactly as in
+    FileReader. With validation="fast" the whole table is checked by
+    check_columns instead, so the reader does not collect the events.
+    """
+    reader.RunningStatus = None
+    reader.unchecked = None
+    channel_message_at = reader.channel_message_at
+    pack = ROW.pack
+    abstime = 0
+    pos = 0
+    while True:
+        try:
+            tick = trackdata[pos]
+            end = pos + 1
+            if tick & 0x80:
+                tick, end = read_varlen_at(trackdata, pos)
+            stsmsg = trackdata[end]
+            message = channel_message_at(trackdata, end + 1, stsmsg) if stsmsg < 0xF0 else None
+            if message is not None:
+                status, data, pos = message
+                abstime += tick
+                data2 = data[1] if len(data) > 1 else 0
+                rows += pack(abstime, index, status & 0xF0, status & 0x0F, data[0], data2, 0, 0)
+                continue
+            event, pos = reader.parse_midi_event_at(trackdata, pos, basepos, strict)
+        except IndexError:
+            break
+        if not event:
+            continue
+        abstime += event.tick
+        if isinstance(event, (MetaEvent, SysexEvent)):
+            command = event.metacommand if isinstance(event, MetaEvent) else 0
+            rows += pack(abstime, index, event.statusmsg, 0, command, 0, len(payload), len(event.data))
+            payload += bytes(event.data)
+        else:
+            data = event.data
+            data2 = data[1] if len(data) > 1 else 0
+            rows += pack(abstime, index, event.statusmsg, event.channel, data[0], data2, 0, 0)
+
+
+def write_columnar(file, tables, resolution=None, format=None, running_status=None):
+    """Writes per-track event tables to a MIDI file without building event objects.
+
+    tables is a ColumnarPattern or a sequence of per-track tables. A table
+    is a structured array or a mapping of equal-length columns named as in
+    EVENT_DTYPE: abs_tick and status, plus optional channel, data1 and
+    data2. Meta and sysex rows need their payloads and are only accepted
+    from a ColumnarPattern, which is written as it is. Tracks given as
+    plain tables get an End of Track event at their last tick.
+
+    running_status defaults to the useRunningStatus of a ColumnarPattern
+    and to True for plain tables.
+    """
+    payload = None
+    if isinstance(tables, ColumnarPattern):
+        payload = tables.payload
+        running_status = tables.useRunningStatus if running_status is None else running_status
+        resolution = tables.resolution if resolution is None else resolution
+        format = tables.format if format is None else format
+        tables = [tables.track(index) for index in range(len(tables))]
+    if type(file) in (str, bytes):
+        with open(file, "wb") as out:
+            return write_columnar(out, tables, resolution, format, running_status)
+    if running_status is None:
+        running_status = True
+    header = Pattern(resolution=220 if resolution is None else resolution, format=1 if format is None else format)
+    writer = FileWriter(file)
+    writer.write_file_header(header, len(tables))
+    for table in tables:
+        data = encode_track_columns(table, payload, running_status, end_of_track=payload is None)
+        file.write(writer.encode_track_header(len(data)) + data)
+
+
+def get_column(table, name, count):
+    try:
+        return np.asarray(table[name], dtype=np.int64)
+    except (KeyError, ValueError):
+        return np.zeros(count, dtype=np.int64)
+
+
+def encode_track_columns(table, payload=None, running_status=True, end_of_track=True):
+    """Encodes one track table into the body of an MTrk chunk.
+
+    Delta times, variable-length quantities and running status are
+    computed with whole-array operations; only meta and sysex rows are
+    encoded one by one.
+    """
+    ticks = np.asarray(table["abs_tick"], dtype=np.int64)
+    count = len(ticks)
+    status = np.asarray(table["status"], dtype=np.int64)
+    data1 = get_column(table, "data1", count)
+    data2 = get_column(table, "data2", count)
+    channel_rows = status < 0xF0
+    status = np.where(channel_rows, status | get_column(table, "channel", count), status)
+    if count and (status.min() < 0x80 or status.max() > 0xFF):
+        raise ValueError("Status bytes must be in range 0x80-0xFF")
+    if count and (min(data1.min(), data2.min()) < 0 or max(data1.max(), data2.max()) > 0xFF):
+        raise ValueError("Data bytes must be in range 0-255")
+    delta = np.diff(ticks, prepend=0)
+    if count and delta.min() < 0:
+        raise ValueError("abs_tick must not decrease within a track")
+    if count and delta.max() > 0x0FFFFFFF:
+        raise ValueError("Delta time does not fit in a variable-length quantity")
+    varlen_size = 1 + (delta > 0x7F) + (delta > 0x3FFF) + (delta > 0x1FFFFF)
+
+    # A status byte is sent unless it repeats the one of the previous
+    # channel message; meta and sysex events break the run.
+    previous = np.roll(np.where(channel_rows, status, -1), 1)
+    if count:
+        previous[0] = -1
+    send_status = (status != previous) | (not running_status)
+    high = status & 0xF0
+    data_size = np.where((high == 0xC0) | (high == 0xD0), 1, 2)
+    row_size = varlen_size + send_status + data_size
+    special = {}
+    for row in np.flatnonzero(~channel_rows):
+        if payload is None:
+            raise ValueError("Meta and sysex rows can only be written from a ColumnarPattern")
+        offset, length = int(table["offset"][row]), int(table["length"][row])
+        head = bytes((0xFF, int(data1[row]))) if status[row] == 0xFF else bytes((int(status[row]),))
+        special[row] = head + write_varlen(length) + bytes(payload[offset : offset + length])
+        row_size[row] = varlen_size[row] + len(special[row])
+    starts = np.cumsum(row_size) - row_size
+
+    out = np.zeros(int(row_size.sum()), dtype=np.uint8)
+    for index in range(4):
+        rows = varlen_size > index
+        shift = 7 * (varlen_size[rows] - 1 - index)
+        more = np.where(index < varlen_size[rows] - 1, 0x80, 0)
+        out[starts[rows] + index] = ((delta[rows] >> shift) & 0x7F) | more
+    pos = starts + varlen_size
+    rows = channel_rows & send_status
+    out[pos[rows]] = status[rows]
+    pos += send_status
+    out[pos[channel_rows]] = data1[channel_rows]
+    rows = channel_rows & (data_size == 2)
+    out[pos[rows] + 1] = data2[rows]
+    for row, data in special.items():
+        start = starts[row] + varlen_size[row]
+        out[start : start + len(data)] = np.frombuffer(data, dtype=np.uint8)
+
+    data = out.tobytes()
+    if end_of_track and not (count and status[-1] == 0xFF and data1[-1] == 0x2F):
+        data += b"\x00\xff\x2f\x00"
+    return data
@@ -0,0 +1,67 @@
+### Local ###
+from .events import AbstractEvent, EventRegistry, MetaEvent, MetaEventWithText
+
+# Class attributes that are not copied from the regular event classes
+SKIPPED_ATTRIBUTES = {"__init__", "__dict__", "__weakref__", "__module__", "__qualname__", "__doc__", "__slots__"}
+
+
+class CompactEvent:
+    """
+    Base class of the compact events. Compact events have no instance
+    __dict__ and keep their payload in an immutable bytes object, which
+    makes them several times smaller than the regular event classes.
+
+    There is one compact class for every registered event class, named
+    after it with a Compact prefix. They share its class attributes,
+    methods and read-only properties, but data cannot be modified.
+    """
+
+    __slots__ = ("tick", "data")
+
+    def __init__(self, tick=0, data=b""):
+        self.tick = tick
+        self.data = bytes(data)
+
+
+class CompactChannelEvent(CompactEvent):
+    __slots__ = ("channel",)
+
+    def __init__(self, tick=0, channel=0, data=b""):
+        self.tick = tick
+        self.channel = channel
+        self.data = bytes(data)
+
+
+class CompactTextEvent(CompactEvent):
+    __slots__ = ()
+
+    @property
+    def text(self):
+        return self.data
+
+
+def make_compact_class(cls):
+    if issubclass(cls, MetaEventWithText):
+        base = CompactTextEvent
+    elif issubclass(cls, MetaEvent):
+        base = CompactEvent
+    else:
+        base = CompactChannelEvent
+    namespace = {"__slots__": (), "__module__": __name__, "event_class": cls}
+    for klass in reversed(cls.__mro__[: cls.__mro__.index(AbstractEvent) + 1]):
+        for key, value in vars(klass).items():
+            if key in SKIPPED_ATTRIBUTES:
+                continue
+            if isinstance(value, property):
+                value = property(value.fget)
+            namespace[key] = value
+    return type(f"Compact{cls.__name__}", (base,), namespace)
+
+
+COMPACT_EVENTS = {
+    cls: make_compact_class(cls)
+    for cls in (*EventRegistry.Events.values(), *EventRegistry.MetaEvents.values())
+}
+
+# Make the generated classes importable by name so that they can be pickled
+globals().update({compact.__name__: compact for compact in COMPACT_EVENTS.values()})
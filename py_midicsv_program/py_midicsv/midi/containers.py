@@ -27,11 +27,13 @@ class Pattern(list):
     def __getitem__(self, item):
         if isinstance(item, slice):
             indices = item.indices(len(self))
-            return Pattern(
+            pattern = Pattern(
                 resolution=self.resolution,
                 format=self.format,
-                tracks=(super(Pattern, self).__getitem__(i) for i in range(*indices)),
+                tracks=(self[i] for i in range(*indices)),
             )
+            pattern.useRunningStatus = self.useRunningStatus
+            return pattern
         else:
             return super().__getitem__(item)
 
@@ -41,6 +43,57 @@ class Pattern(list):
         return self.__getitem__(slice(i, j))
 
 
+class LazyPattern(Pattern):
+    """
+    A Pattern whose tracks are decoded on first access. loader is
+    called with a track index and returns the decoded Track, setting
+    useRunningStatus if the track uses running status.
+
+    Reading useRunningStatus decodes the tracks not decoded yet until one
+    uses running status, so it is the same as for an eagerly read Pattern.
+    """
+
+    def __init__(self, loader, tracks=0, resolution=220, format=1):
+        self.loader = loader
+        self.running_status = False
+        super().__init__(tracks=[None] * tracks, resolution=resolution, format=format)
+
+    @property
+    def useRunningStatus(self):
+        for index in range(len(self)):
+            if self.running_status:
+                break
+            self[index]
+        return self.running_status
+
+    @useRunningStatus.setter
+    def useRunningStatus(self, value):
+        self.running_status = value
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return super().__getitem__(item)
+        track = list.__getitem__(self, item)
+        if track is None:
+            index = range(len(self))[item]
+            track = self.loader(index)
+            list.__setitem__(self, index, track)
+        return track
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def is_loaded(self, index):
+        return list.__getitem__(self, index) is not None
+
+
 class Track(list):
     def __init__(self, events=None, tick_relative=True):
         self.tick_relative = tick_relative
@@ -60,8 +60,8 @@ class AbstractEvent(metaclass=AutoRegister):
         return f"{self.__class__.__name__}(tick={self.tick}, data={self.data})"
 
     def check(self):
-        if isinstance(self.length, int):
-            assert len(self.data) == self.length, f"Event length mismatch for {self.__class__.__name__}"
+        if isinstance(self.length, int) and len(self.data) != self.length:
+            raise ValueError(f"Event length mismatch for {self.__class__.__name__}")
         self.validate()
 
     @abstractmethod
@@ -137,8 +137,10 @@ class NoteEvent(Event):
     velocity = property(get_velocity, set_velocity)
 
     def validate(self):
-        assert 0 <= self.data[0] <= 127, f"Note value is out of range: {self.data[0]}"
-        assert 0 <= self.data[1] <= 127, f"Velocity value is out of range: {self.data[1]}"
+        if not 0 <= self.data[0] <= 127:
+            raise ValueError(f"Note value is out of range: {self.data[0]}")
+        if not 0 <= self.data[1] <= 127:
+            raise ValueError(f"Velocity value is out of range: {self.data[1]}")
 
 
 class NoteOnEvent(NoteEvent):
@@ -173,8 +175,10 @@ class AfterTouchEvent(Event):
     value = property(get_value, set_value)
 
     def validate(self):
-        assert 0 <= self.data[0] <= 127, f"Note value is out of range: {self.data[0]}"
-        assert 0 <= self.data[1] <= 127, f"Pressure value is out of range: {self.data[1]}"
+        if not 0 <= self.data[0] <= 127:
+            raise ValueError(f"Note value is out of range: {self.data[0]}")
+        if not 0 <= self.data[1] <= 127:
+            raise ValueError(f"Pressure value is out of range: {self.data[1]}")
 
 
 class ControlChangeEvent(Event):
@@ -197,8 +201,10 @@ class ControlChangeEvent(Event):
         return self.data[1]
 
     def validate(self):
-        assert 0 <= self.data[0] <= 127, f"Controller number is out of range: {self.data[0]}"
-        assert 0 <= self.data[1] <= 127, f"Controller value is out of range: {self.data[1]}"
+        if not 0 <= self.data[0] <= 127:
+            raise ValueError(f"Controller number is out of range: {self.data[0]}")
+        if not 0 <= self.data[1] <= 127:
+            raise ValueError(f"Controller value is out of range: {self.data[1]}")
 
     value = property(get_value, set_value)
 
@@ -217,7 +223,8 @@ class ProgramChangeEvent(Event):
     value = property(get_value, set_value)
 
     def validate(self):
-        assert 0 <= self.data[0] <= 127, f"Program value is out of range: {self.data[0]}"
+        if not 0 <= self.data[0] <= 127:
+            raise ValueError(f"Program value is out of range: {self.data[0]}")
 
 
 class ChannelAfterTouchEvent(Event):
@@ -234,7 +241,8 @@ class ChannelAfterTouchEvent(Event):
     value = property(get_value, set_value)
 
     def validate(self):
-        assert 0 <= self.data[0] <= 127, f"Pressure value is out of range: {self.data[1]}"
+        if not 0 <= self.data[0] <= 127:
+            raise ValueError(f"Pressure value is out of range: {self.data[0]}")
 
 
 class PitchWheelEvent(Event):
@@ -1,6 +1,16 @@
+import contextlib
+import heapq
+import io
+import mmap
+import shutil
 import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+from operator import itemgetter
 from struct import pack, unpack
 
+from .compact import COMPACT_EVENTS
 from .constants import *
 from .containers import *
 from .events import *
@@ -24,6 +34,93 @@ def warn_or_error(text, strict=True, is_parse=True):
     print(f"Warning: {text}", file=sys.stderr)
 
 
+def errmsg(msg, data, pos):
+    return f"{msg} 0x{data:02X} at position {pos}"
+
+
+VALIDATION_MODES = ("none", "fast", "full")
+
+
+def check_validation_mode(validation):
+    if validation not in VALIDATION_MODES:
+        raise ValueError(f"Unknown validation mode: {validation!r}, expected one of {VALIDATION_MODES}")
+
+
+def check_each_event(events, strict=True, location=""):
+    """Calls check() on every event and reports each failure."""
+    for event in events:
+        try:
+            event.check()
+        except Exception as e:
+            warn_or_error(f"{e}{location}", strict, is_parse=False)
+
+
+def check_events_bulk(events, strict=True, location=""):
+    """Checks a batch of events as a whole, as done by validation="fast".
+
+    The data bytes of all channel events are joined and range-checked with
+    a single max(), and fixed payload lengths are compared in one pass.
+    Only if either check fails are the events checked one by one, so that
+    the same events are accepted or rejected as with validation="full".
+    """
+    try:
+        data = bytes(chain.from_iterable([event.data for event in events if event.statusmsg < 0xF0]))
+    except (TypeError, ValueError):
+        data = b"\x80"
+    if max(data, default=0) < 0x80 and all(
+        len(event.data) == event.length for event in events if event.length.__class__ is int
+    ):
+        return
+    check_each_event(events, strict, location)
+
+
+def validate_pattern(pattern, validation="full", strict=True):
+    """Checks the events of an already built Pattern, such as the one returned by csvmidi.parse.
+
+    validation is "full" to check every event, "fast" to check each track
+    in bulk, or "none". Failures raise ValidationError if strict is set and
+    are printed as warnings otherwise.
+    """
+    check_validation_mode(validation)
+    if validation == "none":
+        return pattern
+    check = check_events_bulk if validation == "fast" else check_each_event
+    for index, track in enumerate(pattern):
+        check(track, strict, f" in track {index}")
+    return pattern
+
+
+def map_midifile(midifile):
+    """Returns a read-only buffer over the rest of an open MIDI file.
+
+    Regular files are memory-mapped. Streams that cannot be mapped (pipes,
+    sockets, in-memory files) are read once and wrapped in a memoryview.
+    """
+    buf = mmap_midifile(midifile)
+    if buf is None:
+        return memoryview(midifile.read())
+    return buf
+
+
+def mmap_midifile(midifile):
+    """Memory-maps the rest of an open MIDI file, or returns None if it cannot be mapped."""
+    try:
+        offset = midifile.tell()
+        buf = mmap.mmap(midifile.fileno(), 0, access=mmap.ACCESS_READ)
+    except (AttributeError, OSError, ValueError):
+        return None
+    if offset:
+        return memoryview(buf)[offset:]
+    return buf
+
+
+def is_seekable(file):
+    try:
+        return file.seekable()
+    except (AttributeError, OSError, ValueError):
+        return False
+
+
 class Trackiter:
     def __init__(self, iterable, pos=0):
         self._buf = iterable
@@ -41,29 +138,38 @@ class Trackiter:
         return self._pos
 
     def errmsg(self, msg, data):
-        return f"{msg} 0x{data:02X} at position {self.pos()}"
+        return errmsg(msg, data, self.pos())
 
     def assert_data_byte(self, data):
-        assert data & 0x80 == 0, self.errmsg("Unexpected status byte", data)
+        if data & 0x80:
+            raise AssertionError(self.errmsg("Unexpected status byte", data))
 
     def assert_status_byte(self, data):
-        assert data & 0x80 != 0, self.errmsg("Unexpected data byte", data)
+        if not data & 0x80:
+            raise AssertionError(self.errmsg("Unexpected data byte", data))
 
     def get_data_byte(self, strict=True):
         byte = self.__next__()
-        try:
-            self.assert_data_byte(byte)
-        except Exception as e:
-            print(f"Warning: {e}", file=sys.stderr)
+        if byte & 0x80:
+            print(f"Warning: {self.errmsg('Unexpected status byte', byte)}", file=sys.stderr)
         return byte
 
 
 class FileReader:
+    """
+    Decodes a MIDI file into a Pattern.
+
+    All decoding state lives on the reader instance, and whether the file
+    used running status is recorded on the returned Pattern, so readers in
+    different threads do not interfere. A single reader must not be used
+    by more than one thread at a time.
+    """
+
     def read(self, midifile, strict=True):
         pattern = self.parse_file_header(midifile, strict)
-        Pattern.useRunningStatus = False
         for track in pattern:
             self.parse_track(midifile, track, strict)
+        pattern.useRunningStatus = self.useRunningStatus
         return pattern
 
     def parse_file_header(self, midifile, strict=True):
@@ -81,7 +187,7 @@ class FileReader:
         format = data[1]
         tracks = [Track() for x in range(data[2])]
         resolution = data[3]
-        Pattern.useRunningStatus = False
+        self.useRunningStatus = False
         # XXX: the assumption is that any remaining bytes
         # in the header are padding
         if hdrsz > DEFAULT_MIDI_HEADER_SIZE:
@@ -158,7 +264,7 @@ class FileReader:
             if key not in EventRegistry.Events:
                 if not self.RunningStatus:
                     trackdata.assert_status_byte(stsmsg)
-                Pattern.useRunningStatus = True
+                self.useRunningStatus = True
                 key = self.RunningStatus & 0xF0
                 cls = EventRegistry.Events[key]
                 channel = self.RunningStatus & 0x0F
@@ -189,11 +295,511 @@ class FileReader:
         warn_or_error(f"Unknown MIDI Event {stsmsg} at position {trackdata.pos()}", strict)
 
 
+class MappedFileReader(FileReader):
+    """FileReader that decodes from a memory-mapped buffer.
+
+    Events are decoded with integer offsets into the buffer instead of
+    one iterator step per byte, and payloads are copied out as slices.
+    The resulting Pattern is identical to the one built by FileReader.
+
+    With compact=True events are built from the compact event classes
+    instead of the regular ones.
+
+    validation selects how decoded events are checked: "full" checks each
+    event as it is decoded, "fast" checks each track in bulk once it is
+    decoded, and "none" skips the checks and the data byte warnings.
+    Channel messages whose data bytes are all below 0x80 cannot fail the
+    checks and are never checked in any mode.
+    Well-formed files are accepted in every mode. Callers that do the
+    "fast" checks themselves set unchecked to None to stop the collection.
+    """
+
+    def __init__(self, compact=False, validation="full"):
+        check_validation_mode(validation)
+        self.useRunningStatus = False
+        self.compact = compact
+        self.validation = validation
+        self.unchecked = []
+        if compact:
+            self.decoders, self.meta_decoders = COMPACT_DECODERS
+
+    def read(self, midifile, strict=True, workers=None):
+        """Decodes midifile into a Pattern.
+
+        With workers > 1 the tracks are decoded concurrently in a pool of
+        that many processes and reassembled in file order. Warnings are
+        replayed per track in file order; the first failing track raises.
+        """
+        buf = map_midifile(midifile)
+        pattern, pos = self.parse_file_header_at(buf, strict)
+        if workers and workers > 1 and len(pattern) > 1:
+            self.parse_tracks_parallel(buf, pos, pattern, strict, workers)
+        else:
+            for track in pattern:
+                pos = self.parse_track_at(buf, pos, track, strict)
+        pattern.useRunningStatus = self.useRunningStatus
+        return pattern
+
+    def parse_tracks_parallel(self, buf, pos, pattern, strict, workers):
+        chunks = self.index_tracks(buf, pos, len(pattern))
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as executor:
+            futures = [
+                executor.submit(
+                    parse_track_chunk,
+                    bytes(buf[offset : offset + trksz]),
+                    offset,
+                    strict,
+                    self.compact,
+                    self.validation,
+                )
+                for offset, trksz in chunks
+            ]
+            for index, future in enumerate(futures):
+                track, running_status, warnings, error = future.result()
+                sys.stderr.write(warnings)
+                if running_status:
+                    self.useRunningStatus = True
+                if error is not None:
+                    for pending in futures[index + 1 :]:
+                        pending.cancel()
+                    raise error
+                pattern[index] = track
+
+    def parse_file_header_at(self, buf, strict=True):
+        magic = bytes(buf[:4])
+        if magic != b"MThd":
+            raise TypeError("Bad header in MIDI file.", magic)
+        data = unpack(">LHHH", buf[4:14])
+        hdrsz = data[0] + 8
+        tracks = [Track() for x in range(data[2])]
+        self.useRunningStatus = False
+        # XXX: the assumption is that any remaining bytes
+        # in the header are padding
+        pattern = Pattern(tracks=tracks, resolution=data[3], format=data[1])
+        return pattern, max(hdrsz, DEFAULT_MIDI_HEADER_SIZE)
+
+    def read_lazy(self, midifile, strict=True):
+        """Indexes the MTrk chunks of midifile without decoding them.
+
+        Only the file header and the chunk headers are read up front. The
+        returned LazyPattern decodes each track when it is first accessed,
+        so parse errors in a track are raised at that point.
+        """
+        buf = map_midifile(midifile)
+        pattern, pos = self.parse_file_header_at(buf, strict)
+        chunks = self.index_tracks(buf, pos, len(pattern))
+
+        def load(index):
+            # Every track gets its own reader, so tracks can be decoded in any order or concurrently
+            reader = MappedFileReader(self.compact, self.validation)
+            track = Track()
+            offset, trksz = chunks[index]
+            reader.parse_track_data(memoryview(buf)[offset : offset + trksz], track, offset, strict)
+            if reader.useRunningStatus:
+                lazy.useRunningStatus = True
+            return track
+
+        lazy = LazyPattern(load, len(chunks), resolution=pattern.resolution, format=pattern.format)
+        return lazy
+
+    def index_tracks(self, buf, pos, count):
+        """Returns the (offset, length) of the body of each of the next count MTrk chunks."""
+        chunks = []
+        for _ in range(count):
+            trksz = self.parse_track_header_at(buf, pos)
+            chunks.append((pos + 8, trksz))
+            pos += 8 + trksz
+        return chunks
+
+    def parse_track_header_at(self, buf, pos):
+        magic = bytes(buf[pos : pos + 4])
+        if magic != b"MTrk":
+            raise TypeError("Bad track header in MIDI file: ", magic)
+        return unpack(">L", buf[pos + 4 : pos + 8])[0]
+
+    def parse_track_at(self, buf, pos, track, strict=True):
+        trksz = self.parse_track_header_at(buf, pos)
+        pos += 8
+        self.parse_track_data(memoryview(buf)[pos : pos + trksz], track, pos, strict)
+        return pos + trksz
+
+    def parse_track_data(self, trackdata, track, basepos=0, strict=True):
+        """Decodes the body of one MTrk chunk into track.
+
+        basepos is the file offset of trackdata[0] and is only used to
+        report error positions. A truncated final event is dropped.
+        """
+        track.extend(self.iter_track_events(trackdata, basepos, strict))
+
+    def iter_track_events(self, trackdata, basepos=0, strict=True):
+        """Yields the events of one MTrk chunk body as they are decoded.
+
+        Each status byte is dispatched through the decoders table; status
+        bytes without a routine go through parse_midi_event_at. With
+        validation="fast" the events that need checking are collected and
+        checked in bulk once the track is exhausted.
+        """
+        self.RunningStatus = None
+        self.unchecked = []
+        decoders = self.decoders
+        pos = 0
+        while True:
+            try:
+                start = pos
+                tick = trackdata[pos]
+                pos += 1
+                if tick & 0x80:
+                    tick, pos = read_varlen_at(trackdata, start)
+                stsmsg = trackdata[pos]
+                decode, cls = decoders[stsmsg]
+                if decode is None:
+                    event, pos = self.parse_midi_event_at(trackdata, start, basepos, strict)
+                else:
+                    event, pos = decode(self, trackdata, pos + 1, tick, stsmsg, cls, basepos, strict)
+            except IndexError:
+                break
+            if event:
+                yield event
+        if self.unchecked:
+            check_events_bulk(self.unchecked, strict, f" in track at position {basepos}")
+            self.unchecked = []
+
+    def channel_message_at(self, trackdata, pos, stsmsg):
+        """Reads a well-formed channel message without building an event.
+
+        stsmsg is the byte before pos: the status byte, or the first data
+        byte under running status. Returns the status byte, the data bytes
+        and the position after them, keeping RunningStatus and
+        useRunningStatus up to date. Returns None for a message without a
+        status byte to run on, with a data byte of 0x80 or more or cut off
+        by the end of the track; those are left to the slow paths, which
+        report them.
+        """
+        if stsmsg & 0x80:
+            status = stsmsg
+            length = CHANNEL_LENGTHS[status]
+            data = list(trackdata[pos : pos + length])
+        else:
+            status = self.RunningStatus
+            if not status:
+                return None
+            length = CHANNEL_LENGTHS[status]
+            data = [stsmsg, *trackdata[pos : pos + length - 1]]
+        if len(data) != length or max(data) & 0x80:
+            return None
+        self.RunningStatus = status
+        if not stsmsg & 0x80:
+            self.useRunningStatus = True
+        return status, data, pos + length - (not stsmsg & 0x80)
+
+    def parse_channel_at(self, trackdata, pos, tick, stsmsg, cls, basepos=0, strict=True):
+        message = self.channel_message_at(trackdata, pos, stsmsg)
+        if message is None:
+            return self.parse_channel_slow_at(trackdata, pos, tick, stsmsg, basepos, strict)
+        status, data, pos = message
+        return (cls or self.decoders[status][1])(tick=tick, channel=status & 0x0F, data=data), pos
+
+    def parse_channel_slow_at(self, trackdata, pos, tick, stsmsg, basepos=0, strict=True):
+        if stsmsg & 0x80:
+            status, data = stsmsg, []
+        else:
+            status = self.RunningStatus
+            if not status:
+                raise AssertionError(errmsg("Unexpected data byte", stsmsg, basepos + pos))
+            self.useRunningStatus = True
+            data = [stsmsg]
+        self.RunningStatus = status
+        cls = self.decoders[status][1]
+        return self.parse_channel_data_at(trackdata, pos, tick, status, cls, data, basepos, strict)
+
+    def parse_channel_data_at(self, trackdata, pos, tick, status, cls, data, basepos=0, strict=True):
+        """Slow path for channel messages with missing or out-of-range data bytes."""
+        count = cls.length - len(data)
+        data = data + self.get_data_bytes_at(trackdata, pos, count, basepos)
+        event = cls(tick=tick, channel=status & 0x0F, data=data)
+        return self.check_event_at(event, pos + count, basepos, strict)
+
+    def parse_meta_at(self, trackdata, pos, tick, stsmsg, cls, basepos=0, strict=True):
+        cmd = trackdata[pos]
+        if cmd & 0x80:
+            self.get_data_bytes_at(trackdata, pos, 1, basepos)
+        pos += 1
+        cls = self.meta_decoders[cmd]
+        if cls is None:
+            print(f"Unknown Meta MIDI Event {cmd} at position {basepos + pos}", file=sys.stderr)
+            return None, pos
+        datalen, pos = read_varlen_at(trackdata, pos)
+        data, pos = self.get_payload_at(trackdata, pos, datalen)
+        return self.check_event_at(cls(tick=tick, data=data), pos, basepos, strict)
+
+    def parse_sysex_at(self, trackdata, pos, tick, stsmsg, cls, basepos=0, strict=True):
+        datalen, pos = read_varlen_at(trackdata, pos)
+        data, pos = self.get_payload_at(trackdata, pos, datalen)
+        return self.check_event_at(cls(tick=tick, data=data), pos, basepos, strict)
+
+    def check_event_at(self, event, pos, basepos=0, strict=True):
+        if self.validation == "full":
+            try:
+                event.check()
+            except Exception as e:
+                warn_or_error(f"{e} at position {basepos + pos}", strict, is_parse=False)
+        elif self.validation == "fast" and self.unchecked is not None:
+            self.unchecked.append(event)
+        return event, pos
+
+    def parse_midi_event_at(self, trackdata, pos, basepos=0, strict=True):
+        # first datum is varlen representing delta-time
+        tick = trackdata[pos]
+        if tick & 0x80:
+            tick, pos = read_varlen_at(trackdata, pos)
+        else:
+            pos += 1
+        # next byte is status message
+        stsmsg = trackdata[pos]
+        pos += 1
+        # is the event a MetaEvent?
+        if MetaEvent.is_event(stsmsg):
+            cmd = self.get_data_bytes_at(trackdata, pos, 1, basepos)[0]
+            pos += 1
+            if cmd not in EventRegistry.MetaEvents:
+                print(
+                    f"Unknown Meta MIDI Event {cmd} at position {basepos + pos}",
+                    file=sys.stderr,
+                )
+                return None, pos
+            cls = EventRegistry.MetaEvents[cmd]
+            datalen, pos = read_varlen_at(trackdata, pos)
+            data, pos = self.get_payload_at(trackdata, pos, datalen)
+            event = cls(tick=tick, data=data)
+        # is this event a Sysex Event?
+        elif SysexEvent.is_event(stsmsg):
+            datalen, pos = read_varlen_at(trackdata, pos)
+            data, pos = self.get_payload_at(trackdata, pos, datalen)
+            if stsmsg not in EventRegistry.Events:
+                warn_or_error(
+                    f"Unknown Sysex Event {stsmsg:02x} at position {basepos + pos}",
+                    strict,
+                )
+                return None, pos
+            cls = EventRegistry.Events[stsmsg]
+            event = cls(tick=tick, data=data)
+        # not a Meta MIDI event or a Sysex event, must be a general message
+        else:
+            key = stsmsg & 0xF0
+            if key not in EventRegistry.Events:
+                if not self.RunningStatus and not stsmsg & 0x80:
+                    raise AssertionError(errmsg("Unexpected data byte", stsmsg, basepos + pos))
+                self.useRunningStatus = True
+                cls = EventRegistry.Events[self.RunningStatus & 0xF0]
+                data = [stsmsg]
+                count = cls.length - 1
+            else:
+                self.RunningStatus = stsmsg
+                cls = EventRegistry.Events[key]
+                data = []
+                count = cls.length
+            end = pos + count
+            data.extend(trackdata[pos:end])
+            if len(data) != cls.length or (count and max(data) & 0x80):
+                data[len(data) - count :] = self.get_data_bytes_at(trackdata, pos, count, basepos)
+            pos = end
+            event = cls(tick=tick, channel=self.RunningStatus & 0x0F, data=data)
+        return self.check_event_at(event, pos, basepos, strict)
+
+    def get_payload_at(self, trackdata, pos, datalen):
+        end = pos + datalen
+        if end > len(trackdata):
+            raise IndexError("MIDI event payload runs past the end of the track")
+        return list(trackdata[pos:end]), end
+
+    def get_data_bytes_at(self, trackdata, pos, count, basepos=0):
+        data = list(trackdata[pos : pos + count])
+        if data and max(data) & 0x80 and self.validation == "full":
+            for i, byte in enumerate(data, basepos + pos + 1):
+                if byte & 0x80:
+                    print(f"Warning: {errmsg('Unexpected status byte', byte, i)}", file=sys.stderr)
+        if len(data) < count:
+            raise IndexError("MIDI event runs past the end of the track")
+        return data
+
+
+class EventStream:
+    """
+    Iterates over the events of a MIDI file without building a Pattern.
+
+    Yields (track_index, abs_tick, event) tuples in file order, where
+    event.tick keeps the delta time it has in a decoded Track. The header
+    fields format, resolution and len() are available before iterating.
+
+    Regular files are memory-mapped; other streams are read one MTrk
+    chunk at a time, so memory is bounded by the largest chunk.
+    """
+
+    def __init__(self, midifile, strict=True, compact=False, validation="full"):
+        self.file = None
+        if type(midifile) in (str, bytes):
+            midifile = self.file = open(midifile, "rb")
+        self.midifile = midifile
+        self.strict = strict
+        self.reader = MappedFileReader(compact, validation)
+        self.buf = mmap_midifile(midifile)
+        if self.buf is None:
+            header = self.reader.parse_file_header(midifile, strict)
+        else:
+            header, self.reader.basepos = self.reader.parse_file_header_at(self.buf, strict)
+            self.close()
+        self.format = header.format
+        self.resolution = header.resolution
+        self.tracks = len(header)
+
+    def __len__(self):
+        return self.tracks
+
+    def __iter__(self):
+        try:
+            for index in range(self.tracks):
+                abstime = 0
+                for event in self.iter_track(index):
+                    abstime += event.tick
+                    yield index, abstime, event
+        finally:
+            self.close()
+
+    def iter_track(self, index):
+        reader = self.reader
+        if self.buf is None:
+            trksz = reader.parse_track_header(self.midifile)
+            trackdata = self.midifile.read(trksz)
+        else:
+            trksz = reader.parse_track_header_at(self.buf, reader.basepos)
+            reader.basepos += 8
+            trackdata = memoryview(self.buf)[reader.basepos : reader.basepos + trksz]
+        basepos = reader.basepos
+        reader.basepos += trksz
+        return reader.iter_track_events(trackdata, basepos, self.strict)
+
+    def iter_merged(self):
+        """Yields (track_index, abs_tick, event) tuples across all tracks in absolute time order.
+
+        The tracks are decoded side by side, each by its own reader, and
+        combined with a heap-based k-way merge, so memory grows with the
+        number of tracks rather than the number of events. Events with the
+        same tick come in track order, and in file order within a track.
+        Streams that cannot be memory-mapped are read into memory first.
+        """
+        if self.buf is None:
+            shift, buf, pos = self.reader.basepos, memoryview(self.midifile.read()), 0
+        else:
+            shift, buf, pos = 0, self.buf, self.reader.basepos
+        chunks = self.reader.index_tracks(buf, pos, self.tracks)
+        tracks = [
+            self.iter_track_at(index, buf[offset : offset + trksz], shift + offset)
+            for index, (offset, trksz) in enumerate(chunks)
+        ]
+        try:
+            yield from heapq.merge(*tracks, key=itemgetter(1))
+        finally:
+            self.close()
+
+    def iter_track_at(self, index, trackdata, basepos):
+        reader = MappedFileReader(self.reader.compact, self.reader.validation)
+        abstime = 0
+        for event in reader.iter_track_events(trackdata, basepos, self.strict):
+            abstime += event.tick
+            yield index, abstime, event
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def iter_events(midifile, strict=True, compact=False, validation="full"):
+    """Returns an EventStream over midifile, a path or an open binary file."""
+    return EventStream(midifile, strict, compact, validation)
+
+
+def build_decoder_tables(classes=None):
+    """Maps every status byte and meta command to its decode routine.
+
+    decoders[status] is a (routine, event class) pair; a routine of None
+    sends the status byte through MappedFileReader.parse_midi_event_at.
+    meta_decoders[command] is the meta event class, or None if unknown.
+    classes optionally maps registered event classes to the ones to build.
+    """
+    classes = classes or {}
+    events = {key: classes.get(cls, cls) for key, cls in EventRegistry.Events.items()}
+    decoders = [(None, None)] * 256
+    for status in range(0x80):
+        # Data bytes in place of a status byte are the first data byte under running status
+        decoders[status] = (MappedFileReader.parse_channel_at, None)
+    for status in range(0x80, 0xF0):
+        decoders[status] = (MappedFileReader.parse_channel_at, events[status & 0xF0])
+    for status in (0xF0, 0xF7):
+        decoders[status] = (MappedFileReader.parse_sysex_at, events[status])
+    decoders[0xFF] = (MappedFileReader.parse_meta_at, None)
+    meta_decoders = [EventRegistry.MetaEvents.get(cmd) for cmd in range(256)]
+    meta_decoders = [classes.get(cls, cls) for cls in meta_decoders]
+    return decoders, meta_decoders
+
+
+MappedFileReader.decoders, MappedFileReader.meta_decoders = build_decoder_tables()
+COMPACT_DECODERS = build_decoder_tables(COMPACT_EVENTS)
+
+# Number of data bytes of the channel messages of every status byte, 0 for other status bytes
+CHANNEL_LENGTHS = [EventRegistry.Events[status & 0xF0].length if 0x80 <= status < 0xF0 else 0 for status in range(256)]
+
+
+def parse_track_chunk(trackdata, basepos, strict=True, compact=False, validation="full"):
+    """Decodes one MTrk chunk body in a worker process.
+
+    Returns the Track, whether running status was used, the text written
+    to stderr, and the exception that stopped decoding (or None).
+    """
+    track = Track()
+    stderr = io.StringIO()
+    reader = MappedFileReader(compact, validation)
+    with contextlib.redirect_stderr(stderr):
+        try:
+            reader.parse_track_data(trackdata, track, basepos, strict)
+        except Exception as e:
+            return track, reader.useRunningStatus, stderr.getvalue(), e
+    return track, reader.useRunningStatus, stderr.getvalue(), None
+
+
 class FileWriter:
-    RunningStatus = None
+    """
+    Encodes a Pattern into a MIDI file.
+
+    Tracks can also be written one event at a time with begin_track(),
+    write_event() and end_track(). Encoded events are collected in a buffer
+    of up to write_buffer_size bytes; a track that outgrows it is streamed
+    to the file and its MTrk length is patched in by end_track(). Files that
+    cannot seek get the track through a spill buffer instead, which is kept
+    in memory up to spill_buffer_size bytes and in a temporary file beyond.
+
+    running_status selects whether repeated status bytes of channel
+    messages are left out: True always, False never, and None as recorded
+    in the useRunningStatus of the Pattern being written. With
+    note_off_as_note_on, Note Off events are written as Note On events with
+    velocity 0, which makes for longer runs; their release velocity is lost.
+    status_bytes_saved counts the status bytes left out so far.
+
+    Encoder state lives on the writer instance; a single writer must not
+    be used by more than one thread at a time.
+    """
 
-    def __init__(self, file):
+    write_buffer_size = 1 << 16
+    spill_buffer_size = 1 << 22
+
+    def __init__(self, file, running_status=None, note_off_as_note_on=False):
         self.file = file
+        self.buffer = None
+        self.running_status = running_status
+        self.note_off_as_note_on = note_off_as_note_on
+        self.status_bytes_saved = 0
+        self.RunningStatus = None
+        self.compress = Pattern.useRunningStatus if running_status is None else running_status
 
     def write(self, pattern):
         self.write_file_header(pattern, len(pattern))
@@ -201,6 +807,8 @@ class FileWriter:
             self.write_track(track)
 
     def write_file_header(self, pattern, length=None):
+        if self.running_status is None:
+            self.compress = pattern.useRunningStatus
         if length is None:
             length = len(pattern)
         # First four bytes are MIDI header
@@ -208,12 +816,81 @@ class FileWriter:
         self.file.write(b"MThd" + packdata)
 
     def write_track(self, track):
-        hlen = len(self.encode_track_header(0))
-        buf = bytearray(b"0" * hlen)
-        for event in track:
-            buf.extend(self.encode_midi_event(event))
-        buf[:hlen] = self.encode_track_header(len(buf) - hlen)
-        self.file.write(buf)
+        self.begin_track()
+        self.write_events(track)
+        self.end_track()
+
+    def begin_track(self):
+        if self.buffer is not None:
+            raise RuntimeError("begin_track() called before the previous track was ended")
+        self.buffer = bytearray()
+        self.sink = None
+        self.track_start = None
+        self.track_length = 0
+        # Running status never carries over into a new MTrk chunk, even after a track without End_track
+        self.RunningStatus = None
+
+    def write_event(self, event):
+        self.write_events((event,))
+
+    def write_events(self, events):
+        buf = self.buffer
+        if buf is None:
+            raise RuntimeError("write_event() called outside of a track, call begin_track() first")
+        for event in events:
+            buf += self.encode_midi_event(event)
+            if len(buf) >= self.write_buffer_size:
+                self.flush_track_buffer()
+
+    def write_channel_message(self, delta, status, data):
+        """Encodes a channel message from its delta time, status byte and data bytes, without an event object."""
+        buf = self.buffer
+        if buf is None:
+            raise RuntimeError("write_channel_message() called outside of a track, call begin_track() first")
+        if status & 0xF0 == 0x80 and self.note_off_as_note_on:
+            status |= 0x10
+            data = (data[0], 0)
+        buf += write_varlen(delta)
+        if status != self.RunningStatus or not self.compress:
+            self.RunningStatus = status
+            buf.append(status)
+        else:
+            self.status_bytes_saved += 1
+        buf += bytes(data)
+        if len(buf) >= self.write_buffer_size:
+            self.flush_track_buffer()
+
+    def flush_track_buffer(self):
+        if self.sink is None:
+            if is_seekable(self.file):
+                # Placeholder header, end_track() patches in the length
+                self.track_start = self.file.tell()
+                self.file.write(self.encode_track_header(0))
+                self.sink = self.file
+            else:
+                self.sink = tempfile.SpooledTemporaryFile(self.spill_buffer_size)
+        self.sink.write(self.buffer)
+        self.track_length += len(self.buffer)
+        self.buffer.clear()
+
+    def end_track(self):
+        if self.buffer is None:
+            raise RuntimeError("end_track() called outside of a track")
+        if self.sink is None:
+            self.file.write(self.encode_track_header(len(self.buffer)) + self.buffer)
+        else:
+            self.flush_track_buffer()
+            if self.sink is self.file:
+                end = self.file.tell()
+                self.file.seek(self.track_start)
+                self.file.write(self.encode_track_header(self.track_length))
+                self.file.seek(end)
+            else:
+                self.file.write(self.encode_track_header(self.track_length))
+                self.sink.seek(0)
+                shutil.copyfileobj(self.sink, self.file)
+                self.sink.close()
+        self.buffer = self.sink = None
 
     def write_track_header(self, track=None):
         if track is None:
@@ -233,6 +910,44 @@ class FileWriter:
         self.file.write(self.encode_midi_event(event))
 
     def encode_midi_event(self, event):
+        encode = self.encoders.get(type(event))
+        if encode is None:
+            return self.encode_generic_event(event)
+        return encode(self, event)
+
+    def encode_channel_event(self, event):
+        assert isinstance(event.tick, int), event.tick
+        status = event.statusmsg | event.channel
+        data = event.data
+        if status & 0xF0 == 0x80 and self.note_off_as_note_on:
+            status |= 0x10
+            data = (data[0], 0)
+        if status != self.RunningStatus or not self.compress:
+            self.RunningStatus = status
+            return write_varlen(event.tick) + bytes((status, *data))
+        self.status_bytes_saved += 1
+        return write_varlen(event.tick) + bytes(data)
+
+    def encode_meta_event(self, event):
+        assert isinstance(event.tick, int), event.tick
+        self.RunningStatus = None
+        ret = bytearray(write_varlen(event.tick))
+        ret.append(event.statusmsg)
+        ret.append(event.metacommand)
+        ret.extend(write_varlen(len(event.data)))
+        ret.extend(event.data)
+        return ret
+
+    def encode_sysex_event(self, event):
+        assert isinstance(event.tick, int), event.tick
+        self.RunningStatus = None
+        ret = bytearray(write_varlen(event.tick))
+        ret.append(event.statusmsg)
+        ret.extend(write_varlen(len(event.data)))
+        ret.extend(event.data)
+        return ret
+
+    def encode_generic_event(self, event):
         ret = bytearray()
         assert isinstance(event.tick, int), event.tick
         ret.extend(write_varlen(event.tick))
@@ -252,15 +967,42 @@ class FileWriter:
         # not a Meta MIDI event or a Sysex event, must be a general message
         elif isinstance(event, Event):
             status = event.statusmsg | event.channel
-            if status != self.RunningStatus or not Pattern.useRunningStatus:
+            data = event.data
+            if status & 0xF0 == 0x80 and self.note_off_as_note_on:
+                status |= 0x10
+                data = (data[0], 0)
+            if status != self.RunningStatus or not self.compress:
                 self.RunningStatus = status
                 ret.append(status)
-            ret.extend(event.data)
+            else:
+                self.status_bytes_saved += 1
+            ret.extend(data)
         else:
             raise ValueError("Unknown MIDI Event: " + str(event))
         return ret
 
 
+def build_encoder_table():
+    """Maps every registered event class to its FileWriter encode routine.
+
+    Event types missing from the table go through encode_generic_event.
+    """
+    encoders = {}
+    for cls in EventRegistry.Events.values():
+        if issubclass(cls, SysexEvent):
+            encoders[cls] = FileWriter.encode_sysex_event
+        else:
+            encoders[cls] = FileWriter.encode_channel_event
+    for cls in EventRegistry.MetaEvents.values():
+        encoders[cls] = FileWriter.encode_meta_event
+    for cls, compact in COMPACT_EVENTS.items():
+        encoders[compact] = encoders[cls]
+    return encoders
+
+
+FileWriter.encoders = build_encoder_table()
+
+
 def write_midifile(midifile, pattern):
     if type(midifile) in (str, str):
         with open(midifile, "wb") as out:
@@ -269,9 +1011,14 @@ def write_midifile(midifile, pattern):
     return writer.write(pattern)
 
 
-def read_midifile(midifile, strict):
+def read_midifile(midifile, strict, mapped=True, lazy=False, workers=None, compact=False, validation="full"):
     if type(midifile) in (str, bytes):
         with open(midifile, "rb") as inp:
-            return read_midifile(inp, strict)
-    reader = FileReader()
-    return reader.read(midifile, strict)
+            return read_midifile(inp, strict, mapped, lazy, workers, compact, validation)
+    if lazy:
+        return MappedFileReader(compact, validation).read_lazy(midifile, strict)
+    if workers:
+        return MappedFileReader(compact, validation).read(midifile, strict, workers)
+    if mapped or compact or validation != "full":
+        return MappedFileReader(compact, validation).read(midifile, strict)
+    return FileReader().read(midifile, strict)
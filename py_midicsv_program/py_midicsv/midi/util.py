@@ -35,3 +35,18 @@ def write_varlen(value):
     else:
         res = bytes((b1,))
     return res
+
+
+def read_varlen_at(data, pos):
+    """Decodes a varlen quantity starting at data[pos].
+
+    Returns the value and the offset of the first byte after it. Raises
+    IndexError when the quantity runs past the end of data.
+    """
+    value = 0
+    while True:
+        chr = data[pos]
+        pos += 1
+        value = (value << 7) | (chr & 0x7F)
+        if not (chr & 0x80):
+            return value, pos
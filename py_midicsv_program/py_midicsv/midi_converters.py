@@ -1,15 +1,13 @@
+# str.translate table giving the CSV form of every byte
+CSV_ESCAPES = [chr(byte) if 32 <= byte <= 126 else f"\\{byte:03o}" for byte in range(256)]
+CSV_ESCAPES[ord('"')] = '""'
+CSV_ESCAPES[ord("\\")] = "\\\\"
+
+
 def as_csv_str(bytestr):
-    csv_str = ""
-    for byte in bytestr:
-        if byte < 32 or byte > 126:
-            csv_str += f"\\{byte:03o}"
-        elif byte == ord('"'):
-            csv_str += '""'
-        elif byte == ord("\\"):
-            csv_str += "\\\\"
-        else:
-            csv_str += chr(byte)
-    return csv_str
+    if not isinstance(bytestr, (bytes, bytearray)):
+        bytestr = bytes(bytestr)
+    return bytestr.decode("latin-1").translate(CSV_ESCAPES)
 
 
 def write_event(track, time, identifier, data):
@@ -22,73 +20,69 @@ def write_event(track, time, identifier, data):
     return ", ".join(Items) + "\n"
 
 
-def from_NoteOffEvent(track, time, event):
-    return write_event(track, time, "Note_off_c", [event.channel, *event.data])
-
-
-def from_NoteOnEvent(track, time, event):
-    return write_event(track, time, "Note_on_c", [event.channel, *event.data])
-
-
-def from_AfterTouchEvent(track, time, event):
-    return write_event(track, time, "Poly_aftertouch_c", [event.channel, *event.data])
-
+# The converters for the most common events are built once by the factories
+# below and format a whole line with a single f-string. Events with an
+# unexpected number of data bytes fall back to write_event.
 
-def from_ControlChangeEvent(track, time, event):
-    return write_event(track, time, "Control_c", [event.channel, *event.data])
 
+def channel_event_formatter(identifier, length):
+    def convert2(track, time, event):
+        data = event.data
+        if len(data) != 2:
+            return write_event(track, time, identifier, [event.channel, *data])
+        return f"{track}, {time}, {identifier}, {event.channel}, {data[0]}, {data[1]}\n"
 
-def from_ProgramChangeEvent(track, time, event):
-    return write_event(track, time, "Program_c", [event.channel, *event.data])
-
-
-def from_ChannelAfterTouchEvent(track, time, event):
-    return write_event(track, time, "Channel_aftertouch_c", [event.channel, event.data[0]])
-
-
-def from_PitchWheelEvent(track, time, event):
-    return write_event(
-        track,
-        time,
-        "Pitch_bend_c",
-        [event.channel, (event.data[0] | (event.data[1] << 7))],
-    )
-
+    def convert1(track, time, event):
+        data = event.data
+        if len(data) != 1:
+            return write_event(track, time, identifier, [event.channel, *data])
+        return f"{track}, {time}, {identifier}, {event.channel}, {data[0]}\n"
 
-def from_SequenceNumberMetaEvent(track, time, event):
-    return write_event(track, time, "Sequence_number", [((event.data[0] << 8) | event.data[1])])
+    return convert2 if length == 2 else convert1
 
 
-def from_ProgramNameEvent(track, time, event):
-    return write_event(track, time, "Program_name_t", [f'"{as_csv_str(event.text)}"'])
+def text_event_formatter(identifier):
+    def convert(track, time, event):
+        return f'{track}, {time}, {identifier}, "{as_csv_str(event.text)}"\n'
 
+    return convert
 
-def from_TextMetaEvent(track, time, event):
-    return write_event(track, time, "Text_t", [f'"{as_csv_str(event.text)}"'])
 
+def empty_event_formatter(identifier):
+    def convert(track, time, event):
+        return f"{track}, {time}, {identifier}\n"
 
-def from_CopyrightMetaEvent(track, time, event):
-    return write_event(track, time, "Copyright_t", [f'"{as_csv_str(event.text)}"'])
+    return convert
 
 
-def from_TrackNameEvent(track, time, event):
-    return write_event(track, time, "Title_t", [f'"{as_csv_str(event.text)}"'])
+from_NoteOffEvent = channel_event_formatter("Note_off_c", 2)
+from_NoteOnEvent = channel_event_formatter("Note_on_c", 2)
+from_AfterTouchEvent = channel_event_formatter("Poly_aftertouch_c", 2)
+from_ControlChangeEvent = channel_event_formatter("Control_c", 2)
+from_ProgramChangeEvent = channel_event_formatter("Program_c", 1)
 
 
-def from_InstrumentNameEvent(track, time, event):
-    return write_event(track, time, "Instrument_name_t", [f'"{as_csv_str(event.text)}"'])
+def from_ChannelAfterTouchEvent(track, time, event):
+    return f"{track}, {time}, Channel_aftertouch_c, {event.channel}, {event.data[0]}\n"
 
 
-def from_LyricsEvent(track, time, event):
-    return write_event(track, time, "Lyric_t", [f'"{as_csv_str(event.text)}"'])
+def from_PitchWheelEvent(track, time, event):
+    data = event.data
+    return f"{track}, {time}, Pitch_bend_c, {event.channel}, {data[0] | (data[1] << 7)}\n"
 
 
-def from_MarkerEvent(track, time, event):
-    return write_event(track, time, "Marker_t", [f'"{as_csv_str(event.text)}"'])
+def from_SequenceNumberMetaEvent(track, time, event):
+    return write_event(track, time, "Sequence_number", [((event.data[0] << 8) | event.data[1])])
 
 
-def from_CuePointEvent(track, time, event):
-    return write_event(track, time, "Cue_point_t", [f'"{as_csv_str(event.text)}"'])
+from_ProgramNameEvent = text_event_formatter("Program_name_t")
+from_TextMetaEvent = text_event_formatter("Text_t")
+from_CopyrightMetaEvent = text_event_formatter("Copyright_t")
+from_TrackNameEvent = text_event_formatter("Title_t")
+from_InstrumentNameEvent = text_event_formatter("Instrument_name_t")
+from_LyricsEvent = text_event_formatter("Lyric_t")
+from_MarkerEvent = text_event_formatter("Marker_t")
+from_CuePointEvent = text_event_formatter("Cue_point_t")
 
 
 def from_ChannelPrefixEvent(track, time, event):
@@ -99,16 +93,9 @@ def from_PortEvent(track, time, event):
     return write_event(track, time, "MIDI_port", [*event.data] if event.data else [0])
 
 
-def from_EndOfTrackEvent(track, time, event):
-    return write_event(track, time, "End_track", [])
-
-
-def from_DeviceNameEvent(track, time, event):
-    return write_event(track, time, "Device_name_t", [f'"{as_csv_str(event.text)}"'])
-
-
-def from_TrackLoopEvent(track, time, event):
-    return write_event(track, time, "Loop_track", [])
+from_EndOfTrackEvent = empty_event_formatter("End_track")
+from_DeviceNameEvent = text_event_formatter("Device_name_t")
+from_TrackLoopEvent = empty_event_formatter("Loop_track")
 
 
 def from_SetTempoEvent(track, time, event):
@@ -120,9 +107,10 @@ def from_SmpteOffsetEvent(track, time, event):
 
 
 def from_TimeSignatureEvent(track, time, event):
-    if len(event.data) == 2:
-        event.data.extend((24, 8))
-    return write_event(track, time, "Time_signature", [*event.data])
+    data = [*event.data]
+    if len(data) == 2:
+        data.extend((24, 8))
+    return write_event(track, time, "Time_signature", data)
 
 
 def from_KeySignatureEvent(track, time, event):
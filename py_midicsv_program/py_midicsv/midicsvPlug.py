@@ -9,9 +9,10 @@ PARENT_DIR = os.path.dirname(SCRIPT_DIR)
 sys.path.append(PARENT_DIR)
 
 # Import using absolute imports
+from py_midicsv.manifest import Manifest, atomic_open
 from py_midicsv.midi.fileio import FileWriter
-from py_midicsv.csvmidi import parse as csv_to_midi
-from py_midicsv.midicsv import parse as midi_to_csv
+from py_midicsv.csvmidi_stream import parse as csv_to_midi
+from py_midicsv.midicsv_stream import parse as midi_to_csv
 
 def get_base_filename(filename):
     """Extract the base name without version numbers and extension."""
@@ -36,11 +37,26 @@ def get_next_version(directory, base_name, extension):
     
     return max(version_numbers + [0]) + 1
 
-def convert_csv_to_midi(input_file, output_dir):
-    """Convert a CSV file to MIDI format."""
+def convert_csv_to_midi(input_file, output_dir, incremental=False):
+    """Convert a CSV file to MIDI format.
+
+    In incremental mode, a CSV whose content was converted before to a
+    version of the same base name returns the existing MIDI file, found
+    through the manifest in output_dir, instead of writing another version.
+    """
     try:
         # Get base name without version numbers
         input_base = get_base_filename(os.path.basename(input_file))
+
+        manifest = Manifest(output_dir) if incremental else None
+        if manifest is not None:
+            key = manifest.key(input_file)
+            # Only versions of this input count, not another input with the same content
+            existing = manifest.lookup(key, pattern=re.escape(input_base) + r'_v\d+\.mid')
+            if existing is not None:
+                print(f"\nProcessing {input_base}:")
+                print(f"✓ Unchanged since {os.path.basename(existing)}, nothing to convert")
+                return existing
         
         # Generate output file path with versioning
         midi_version = get_next_version(output_dir, input_base, '.mid')
@@ -53,9 +69,12 @@ def convert_csv_to_midi(input_file, output_dir):
         with open(input_file, 'r') as csv_file:
             try:
                 midi_data = csv_to_midi(csv_file)
-                with open(midi_file, 'wb') as midi_file_out:
+                with atomic_open(midi_file) as midi_file_out:
                     writer = FileWriter(midi_file_out)
                     writer.write(midi_data)
+                if manifest is not None:
+                    manifest.record(key, midi_file)
+                    manifest.save()
                 print(f"✓ MIDI file created: {os.path.basename(midi_file)}")
                 return midi_file
             except Exception as e:
@@ -76,9 +95,9 @@ def convert_midi_to_csv(input_file, output_dir, fix_timing=True):
         
         with open(input_file, 'rb') as midi_file:
             try:
-                csv_output = midi_to_csv(midi_file)
-                with open(output_file, 'w') as csv_file:
-                    csv_file.writelines(csv_output)
+                # A decoding error leaves no partial CSV behind
+                with atomic_open(output_file, 'w') as csv_file:
+                    midi_to_csv(midi_file, out=csv_file)
                 
                 # Optionally fix timing issues
                 if fix_timing:
@@ -181,7 +200,7 @@ def round_trip_validation(input_file, output_dir):
     """Perform full round-trip validation: CSV → MIDI → CSV → Compare."""
     try:
         # First conversion: CSV to MIDI
-        midi_file = convert_csv_to_midi(input_file, output_dir)
+        midi_file = convert_csv_to_midi(input_file, output_dir, incremental=True)
         if not midi_file:
             return False
             
@@ -189,9 +208,8 @@ def round_trip_validation(input_file, output_dir):
         validation_csv = os.path.join(output_dir, f"{get_base_filename(os.path.basename(input_file))}_validation.csv")
         with open(midi_file, 'rb') as midi_file_in:
             try:
-                csv_data = midi_to_csv(midi_file_in)
-                with open(validation_csv, 'w') as csv_file_out:
-                    csv_file_out.writelines(csv_data)
+                with atomic_open(validation_csv, 'w') as csv_file_out:
+                    midi_to_csv(midi_file_in, out=csv_file_out)
                 print(f"✓ Validation CSV created: {os.path.basename(validation_csv)}")
             except Exception as e:
                 print(f"❌ MIDI to CSV conversion failed: {str(e)}")
@@ -365,7 +383,7 @@ def main():
         action = input("\nSelect option: ").strip()
         
         if action == '1':
-            convert_csv_to_midi(selected_file_path, output_dir)
+            convert_csv_to_midi(selected_file_path, output_dir, incremental=True)
         elif action == '2':
             round_trip_validation(selected_file_path, output_dir)
 
@@ -0,0 +1,99 @@
+### Local ###
+from .events import midi_to_csv_map
+from .midi.fileio import iter_events
+
+# Number of lines joined into one write() call
+WRITE_BATCH_LINES = 1024
+
+
+def parse(file, strict=True, validation="full", out=None, merge=False):
+    """Parses a MIDI file into CSV format, one line at a time.
+
+    Produces the same lines as midicsv.parse, but decodes the file as it
+    goes instead of building a Pattern first.
+
+    Args:
+        file: A string giving the path to a file on disk or
+              an open file-like object.
+        validation: "full", "fast" or "none", see MappedFileReader.
+        out: An optional text stream. If given, the lines are written to it
+             in batches as they are produced.
+        merge: If set, the events of all tracks are interleaved in absolute
+               time order instead of being listed track by track. The track
+               column is kept; see EventStream.iter_merged for the order of
+               events with the same time. The result is meant for reading
+               and cannot be converted back by csvmidi.parse.
+
+    Returns:
+        An iterator over the lines, one string per atomic MIDI command in
+        CSV format, or the number of lines written if out is given.
+    """
+    if merge:
+        lines = iter_merged_lines(file, strict, validation)
+    else:
+        lines = iter_lines(file, strict, validation)
+    if out is None:
+        return lines
+    return write_lines(lines, out)
+
+
+def iter_lines(file, strict=True, validation="full"):
+    return format_lines(iter_events(file, strict, validation=validation))
+
+
+def format_lines(events):
+    """Formats the (track_index, abs_tick, event) tuples of an EventStream or EventArchive as CSV lines."""
+    yield f"0, 0, Header, {events.format}, {len(events)}, {events.resolution}\n"
+    started = 0
+    for index, abstime, event in events:
+        # Tracks that decode to no events still get their Start_track
+        while started <= index:
+            started += 1
+            yield f"{started}, {0}, Start_track\n"
+        yield midi_to_csv_map[type(event)](index + 1, abstime, event)
+    while started < len(events):
+        started += 1
+        yield f"{started}, {0}, Start_track\n"
+    yield "0, 0, End_of_file"
+
+
+def iter_merged_lines(file, strict=True, validation="full"):
+    events = iter_events(file, strict, validation=validation)
+    yield f"0, 0, Header, {events.format}, {len(events)}, {events.resolution}\n"
+    # Start_track lines count as events at time 0 at the start of their track
+    started = 0
+    for index, abstime, event in events.iter_merged():
+        last = index if abstime == 0 else len(events) - 1
+        while started <= last:
+            started += 1
+            yield f"{started}, {0}, Start_track\n"
+        yield midi_to_csv_map[type(event)](index + 1, abstime, event)
+    while started < len(events):
+        started += 1
+        yield f"{started}, {0}, Start_track\n"
+    yield "0, 0, End_of_file"
+
+
+def write_lines(lines, out, batch=WRITE_BATCH_LINES):
+    """Writes lines to out in batches and returns the number of lines written.
+
+    The first line is written and flushed on its own so that readers of a
+    pipe see output before the first batch is full.
+    """
+    lines = iter(lines)
+    first = next(lines, None)
+    if first is None:
+        return 0
+    out.write(first)
+    if hasattr(out, "flush"):
+        out.flush()
+    count = 1
+    pending = []
+    for line in lines:
+        pending.append(line)
+        if len(pending) == batch:
+            out.write("".join(pending))
+            count += batch
+            pending.clear()
+    out.write("".join(pending))
+    return count + len(pending)
@@ -4,44 +4,107 @@ import sys
 # Add the current directory to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from py_midicsv.csvmidi import parse as csv_to_midi
-from py_midicsv.midi.fileio import FileWriter
+from py_midicsv.csvmidi_stream import CSVError, transcode
+from py_midicsv.events import csv_parameter_counts, csv_type_names
+
+# Characters read from the input at a time
+CHUNK_SIZE = 1 << 16
+
+
+def split_fields(text):
+    """Splits text at the commas and line breaks outside quotes, returning the fields and the unfinished rest."""
+    # Every other part of the text split at its quotes is quoted; only the others are split into fields
+    parts = text.split('"')
+    fields = []
+    field = ""
+    for index, part in enumerate(parts):
+        if index % 2:
+            field += '"' + part
+            continue
+        pieces = part.replace("\n", ",").split(",")
+        field += ('"' if index else "") + pieces[0]
+        if len(pieces) > 1:
+            fields.append(field)
+            fields += pieces[1:-1]
+            field = pieces[-1]
+    return fields, field
+
+
+def iter_fields(file, chunk_size=CHUNK_SIZE):
+    """Yields the stripped fields of a single-line CSV file in lists, one per chunk read.
+
+    Fields are separated by commas or line breaks outside quotes, so the
+    usual one record per line format is read as well. Quoted fields keep
+    their quotes.
+    """
+    carry = ""
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            break
+        fields, carry = split_fields(carry + chunk)
+        yield [field.strip() for field in fields]
+    if carry.count('"') % 2:
+        raise CSVError(f"Unterminated quoted field: {carry[:40]!r}")
+    yield [carry.strip()]
+
+
+def iter_records(chunks):
+    """Groups fields into records by the number of parameters each record type takes.
+
+    Takes the lists of fields yielded by iter_fields. Records may span lists.
+    """
+    fields, pos, index = [], 0, 0
+    for chunk in chunks:
+        fields = fields[pos:] + chunk
+        pos, size = 0, len(fields)
+        while pos < size:
+            if not fields[pos]:
+                pos += 1
+                continue
+            if pos + 3 > size:
+                break
+            identifier = csv_type_names.get(fields[pos + 2].lower())
+            if identifier is None:
+                raise CSVError(f"Record {index + 1}: Unknown record type {fields[pos + 2]!r}")
+            count = csv_parameter_counts[identifier]
+            if count is None:
+                # Variable length records give their byte count, in hex like the bytes, as the first parameter
+                if pos + 4 > size:
+                    break
+                try:
+                    count = 1 + int(fields[pos + 3], 16)
+                except ValueError:
+                    raise CSVError(f"Record {index + 1}: Bad {identifier} length {fields[pos + 3]!r}") from None
+            end = pos + 3 + count
+            if end > size:
+                break
+            index += 1
+            yield fields[pos:end]
+            pos = end
+    if any(fields[pos:]):
+        raise CSVError(f"Record {index + 1}: Incomplete record {fields[pos:]}")
+
+
+def iter_lines(file, chunk_size=CHUNK_SIZE):
+    """Yields the records of a single-line CSV file as lines, which csvmidi parsers take in place of a file."""
+    for record in iter_records(iter_fields(file, chunk_size)):
+        yield ", ".join(record) + "\n"
+
 
 def preprocess_single_line_csv(input_path, output_path):
     """Converts a single-line CSV into multi-line format for the parser."""
-    with open(input_path, 'r') as f:
-        content = f.read()
-    
-    # Split by commas, but preserve commas inside quotes
-    events = []
-    in_quotes = False
-    current_event = []
-    current_token = ""
-    
-    for char in content:
-        if char == '"':
-            in_quotes = not in_quotes
-            current_token += char
-        elif char == ',' and not in_quotes:
-            current_event.append(current_token.strip())
-            current_token = ""
-            if len(current_event) >= 3:  # Check if we have at least track, time, event_type
-                events.append(current_event)
-                current_event = []
-        else:
-            current_token += char
-    
-    # Add the last token and event
-    if current_token:
-        current_event.append(current_token.strip())
-    if current_event:
-        events.append(current_event)
-    
-    # Write the reformatted file
-    with open(output_path, 'w') as f:
-        for event in events:
-            f.write(", ".join(event) + "\n")
+    with open(input_path, "r") as f, open(output_path, "w") as out:
+        out.writelines(iter_lines(f))
+
+    print(f"Converted {input_path} to {output_path}")
+    return output_path
+
 
+def convert_to_midi(input_path, output_path, sort=False):
+    """Converts a single-line CSV straight into a MIDI file. With sort, out of order records are put in order first."""
+    with open(input_path, "r") as f:
+        transcode(iter_lines(f), output_path, sort=sort)
     print(f"Converted {input_path} to {output_path}")
     return output_path
 
@@ -59,7 +122,7 @@ def convert_file(input_file):
 
 def list_input_files(input_dir):
     """List CSV files in the Input directory."""
-    csv_files = [f for f in os.listdir(input_dir) if f.endswith('.csv')]
+    csv_files = [f for f in os.listdir(input_dir) if f.endswith(".csv")]
     return csv_files
 
 if __name__ == "__main__":
@@ -99,4 +162,7 @@ if __name__ == "__main__":
     input_file_path = os.path.join(input_dir, selected_file)
     
     print(f"\nConverting {selected_file}...")
-    convert_file(input_file_path)
\ No newline at end of file
+    output_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Output")
+    os.makedirs(output_dir, exist_ok=True)
+    base_name = os.path.splitext(selected_file)[0]
+    convert_to_midi(input_file_path, os.path.join(output_dir, f"{base_name}.mid"))
\ No newline at end of file
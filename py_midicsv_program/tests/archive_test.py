@@ -0,0 +1,63 @@
+import io
+
+import pytest
+
+from py_midicsv.csvmidi_stream import parse as csv_to_midi
+from py_midicsv.midi.archive import ROW, read_archive, write_archive
+from py_midicsv.midi.events import ProgramChangeEvent
+from py_midicsv.midi.fileio import ParseError, read_midifile
+from py_midicsv.midicsv import parse
+from py_midicsv.midicsv_stream import format_lines
+
+
+def archive_bytes(pattern):
+    out = io.BytesIO()
+    write_archive(out, pattern)
+    return out.getvalue()
+
+
+def test_archive_round_trips_pattern_and_csv(tmp_path):
+    pattern = read_midifile("tests/sample.mid", True)
+    path = tmp_path / "sample.arc"
+    write_archive(str(path), pattern)
+    with read_archive(str(path)) as archive:
+        assert (len(archive), archive.events) == (len(pattern), sum(len(track) for track in pattern))
+        assert archive.to_pattern() == pattern
+        assert archive.to_pattern(compact=True) == read_midifile("tests/sample.mid", True, compact=True)
+        assert list(format_lines(archive)) == parse("tests/sample.mid")
+    # Patterns with absolute ticks and patterns parsed from CSV store the same rows
+    pattern.make_ticks_abs()
+    assert archive_bytes(pattern) == path.read_bytes() == archive_bytes(csv_to_midi(parse("tests/sample.mid")))
+
+
+def test_archive_keeps_unusual_channel_events():
+    pattern = csv_to_midi(["0, 0, Header, 0, 1, 96\n", "1, 0, Start_track\n", "1, 5, End_track\n"])
+    pattern[0].insert(0, ProgramChangeEvent(tick=5, channel=3, data=[5, 6]))
+    archive = read_archive(io.BytesIO(archive_bytes(pattern)))
+    event = archive.to_pattern()[0][0]
+    assert (type(event), event.tick, event.channel, event.data) == (ProgramChangeEvent, 5, 3, [5, 6])
+    pattern[0][0].data = [300]
+    with pytest.raises(ValueError, match="Cannot store ProgramChangeEvent at tick 5 in track 0"):
+        archive_bytes(pattern)
+
+
+def test_archive_rejects_other_files():
+    data = archive_bytes(read_midifile("tests/sample.mid", True))
+    with open("tests/sample.mid", "rb") as f:
+        with pytest.raises(ParseError, match="Bad header"):
+            read_archive(f)
+    with pytest.raises(ParseError, match="truncated"):
+        read_archive(io.BytesIO(data[:-1]))
+
+
+def test_archive_columnar_view():
+    np = pytest.importorskip("numpy")
+    from py_midicsv.midi.columnar import EVENT_DTYPE, read_midifile_columnar
+
+    assert EVENT_DTYPE.itemsize == ROW.size
+    archive = read_archive(io.BytesIO(archive_bytes(read_midifile("tests/sample.mid", True))))
+    table, expected = archive.columnar(), read_midifile_columnar("tests/sample.mid")
+    assert table.track_starts == expected.track_starts
+    for name in ("abs_tick", "track", "status", "channel", "data1", "data2", "length"):
+        assert np.array_equal(table.events[name], expected.events[name])
+    assert [table.get_payload(row) for row in table.events] == [expected.get_payload(row) for row in expected.events]
@@ -0,0 +1,76 @@
+from batch_convert import batch_convert
+from py_midicsv.midicsv import parse
+
+
+def test_parallel_batch_matches_serial_batch(tmp_path, capsys):
+    lines = parse("tests/sample.mid")
+    inputs = tmp_path / "Input"
+    inputs.mkdir()
+    for count in (10, 100, len(lines) - 1):
+        (inputs / f"part{count}.csv").write_text("".join(lines[:count]) + "0, 0, End_of_file\n")
+    (inputs / "broken.csv").write_text("0, 0, Header, 1, 1, 96\n1, 0, Nonsense\n")
+    summaries = {}
+    for jobs in (1, 2):
+        batch_convert(jobs, str(inputs), str(tmp_path / f"Output{jobs}"))
+        out = capsys.readouterr().out
+        summaries[jobs] = out[out.index("Batch conversion complete") :].splitlines()[:3]
+        assert out.count("✓ Converted") == 3 and out.count("❌ Error converting broken.csv: Line 2: ") == 1
+    assert summaries[1] == summaries[2]
+    for path in (tmp_path / "Output1").iterdir():
+        assert path.read_bytes() == (tmp_path / "Output2" / path.name).read_bytes()
+
+
+def test_incremental_batch_skips_unchanged_inputs(tmp_path, capsys):
+    lines = parse("tests/sample.mid")
+    inputs, outputs = tmp_path / "Input", tmp_path / "Output"
+    inputs.mkdir()
+    for count in (10, 100, 200):
+        (inputs / f"part{count}.csv").write_text("".join(lines[:count]) + "0, 0, End_of_file\n")
+
+    def run():
+        batch_convert(1, str(inputs), str(outputs), incremental=True)
+        out = capsys.readouterr().out
+        return out.count("✓ Converted"), out.count("Unchanged files skipped: ")
+
+    assert run() == (3, 1)
+    assert run() == (0, 1)
+    # Changed inputs and outputs that were changed or removed are converted again
+    (inputs / "part10.csv").write_text("".join(lines[:20]) + "0, 0, End_of_file\n")
+    (outputs / "part100.mid").unlink()
+    (outputs / "part200.mid").write_bytes(b"")
+    assert run() == (3, 1)
+    assert run() == (0, 1)
+    assert sorted(path.name for path in outputs.iterdir()) == [
+        ".midicsv-manifest.json",
+        "part10.mid",
+        "part100.mid",
+        "part200.mid",
+    ]
+
+
+def test_plug_reuses_converted_version(tmp_path, capsys):
+    from py_midicsv.midicsvPlug import convert_csv_to_midi
+
+    csv_file = tmp_path / "song.csv"
+    csv_file.write_text("".join(parse("tests/sample.mid")))
+    first = convert_csv_to_midi(str(csv_file), str(tmp_path), incremental=True)
+    assert convert_csv_to_midi(str(csv_file), str(tmp_path), incremental=True) == first
+    assert first.endswith("song_v1.mid") and "Unchanged since song_v1.mid" in capsys.readouterr().out
+    csv_file.write_text("".join(parse("tests/sample.mid")[:50]) + "0, 0, End_of_file\n")
+    assert convert_csv_to_midi(str(csv_file), str(tmp_path), incremental=True).endswith("song_v2.mid")
+    # Another input with the same content gets its own version
+    (tmp_path / "other.csv").write_text(csv_file.read_text())
+    assert convert_csv_to_midi(str(tmp_path / "other.csv"), str(tmp_path), incremental=True).endswith("other_v1.mid")
+
+
+def test_plug_leaves_no_partial_csv(tmp_path, capsys):
+    from py_midicsv.midicsvPlug import convert_midi_to_csv
+
+    with open("tests/sample.mid", "rb") as f:
+        data = bytearray(f.read())
+    start = data.index(b"MTrk", 14) + 8
+    data[start + 1] = 0x40  # data byte where the first status byte of track 2 should be
+    (tmp_path / "broken.mid").write_bytes(data)
+    assert convert_midi_to_csv(str(tmp_path / "broken.mid"), str(tmp_path)) is None
+    assert "conversion failed" in capsys.readouterr().out
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["broken.mid"]
@@ -0,0 +1,91 @@
+import io
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from py_midicsv.midi.columnar import parse_track_columns, read_midifile_columnar, write_columnar  # noqa: E402
+from py_midicsv.midi.events import MetaEvent, SysexEvent  # noqa: E402
+from py_midicsv.midi.fileio import FileWriter, MappedFileReader, ValidationError, read_midifile  # noqa: E402
+
+
+def test_columnar_matches_pattern():
+    pattern = read_midifile("tests/sample.mid", True)
+    pattern.make_ticks_abs()
+    table = read_midifile_columnar("tests/sample.mid")
+    assert len(table) == len(pattern)
+    assert table.resolution == pattern.resolution
+    for index, track in enumerate(pattern):
+        rows = table.track(index)
+        assert len(rows) == len(track)
+        assert (rows["track"] == index).all()
+        for row, event in zip(rows, track):
+            assert row["abs_tick"] == event.tick
+            assert row["status"] == event.statusmsg
+            if isinstance(event, (MetaEvent, SysexEvent)):
+                assert table.get_payload(row) == bytes(event.data)
+            else:
+                assert row["channel"] == event.channel
+                assert row["data1"] == event.data[0]
+
+
+def test_columnar_filters_vectorized():
+    table = read_midifile_columnar("tests/sample.mid")
+    notes = table.events[(table.events["status"] == 0x90) & (table.events["data2"] > 0)]
+    assert len(notes) > 0
+    assert np.all(np.diff(table.track(1)["abs_tick"].astype(np.int64)) >= 0)
+
+
+def test_columnar_fast_validation_flags_bad_rows():
+    body = b"\x00\x90\x3c\x90\x00\xff\x2f\x00"
+    data = b"MThd\x00\x00\x00\x06\x00\x00\x00\x01\x00\x60MTrk" + len(body).to_bytes(4, "big") + body
+    assert len(read_midifile_columnar("tests/sample.mid", validation="fast").events) > 0
+    for validation in ("full", "fast"):
+        with pytest.raises(ValidationError, match="Velocity value is out of range: 144"):
+            read_midifile_columnar(io.BytesIO(data), validation=validation)
+    assert len(read_midifile_columnar(io.BytesIO(data), validation="none").events) == 2
+    # check_columns does the checks, so the reader does not collect events to check
+    reader = MappedFileReader(validation="fast")
+    with open("tests/sample.mid", "rb") as f:
+        sample = f.read()
+    start = sample.index(b"MTrk") + 8
+    end = start + int.from_bytes(sample[start - 4 : start], "big")
+    parse_track_columns(reader, memoryview(sample)[start:end], 0, bytearray(), bytearray(), start)
+    assert reader.unchecked is None
+
+
+def test_write_columnar_round_trips_file():
+    pattern = read_midifile("tests/sample.mid", True)
+    expected = io.BytesIO()
+    FileWriter(expected).write(pattern)
+    out = io.BytesIO()
+    write_columnar(out, read_midifile_columnar("tests/sample.mid"))
+    assert out.getvalue() == expected.getvalue()
+
+
+def test_write_columnar_encodes_note_arrays():
+    table = {
+        "abs_tick": np.array([0, 0, 200, 200, 20000]),
+        "status": np.array([0x90, 0x90, 0x80, 0xC0, 0x80]),
+        "channel": np.array([1, 1, 1, 1, 1]),
+        "data1": np.array([60, 64, 60, 5, 64]),
+        "data2": np.array([100, 100, 0, 0, 0]),
+    }
+    out = io.BytesIO()
+    write_columnar(out, [table], resolution=480)
+    pattern = read_midifile(io.BytesIO(out.getvalue()), True)
+    assert pattern.resolution == 480
+    pattern.make_ticks_abs()
+    events = [(e.tick, e.statusmsg, e.data) for e in pattern[0]]
+    assert events == [
+        (0, 0x90, [60, 100]),
+        (0, 0x90, [64, 100]),
+        (200, 0x80, [60, 0]),
+        (200, 0xC0, [5]),
+        (20000, 0x80, [64, 0]),
+        (20000, 0xFF, []),
+    ]
+    # Running status: the second note on omits its status byte
+    assert b"\x00\x91\x3c\x64\x00\x40\x64" in out.getvalue()
+    with pytest.raises(ValueError, match="must not decrease"):
+        write_columnar(io.BytesIO(), [dict(table, abs_tick=table["abs_tick"][::-1])])
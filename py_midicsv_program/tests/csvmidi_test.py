@@ -1,6 +1,208 @@
+import io
+
+import pytest
+from helpers import PipeWriter
+
+from py_midicsv import csvmidi_stream
+from py_midicsv.csv_converters import as_midi_bytes
+from py_midicsv.events import midi_to_csv_map
+from py_midicsv.midi.events import NoteOnEvent, ProgramChangeEvent
+from py_midicsv.midi.fileio import FileWriter, read_midifile
+from py_midicsv.csvmidi import parse as csv_to_midi
+from py_midicsv.midi_converters import as_csv_str, write_event
 from py_midicsv.midicsv import parse
+from py_midicsv.midicsv_stream import parse as iter_parse
 
 
 def test_midicsv():
     parse("tests/sample.mid")
     assert True
+
+
+def test_midicsv_stream_matches_midicsv():
+    assert list(iter_parse("tests/sample.mid")) == parse("tests/sample.mid")
+
+
+def test_midicsv_stream_writes_to_out():
+    out = io.StringIO()
+    count = iter_parse("tests/sample.mid", out=out)
+    lines = parse("tests/sample.mid")
+    assert count == len(lines)
+    assert out.getvalue() == "".join(lines)
+
+
+def test_midicsv_stream_flushes_header_line_first():
+    flushed = []
+
+    class FlushLog(io.StringIO):
+        def flush(self):
+            flushed.append(self.getvalue())
+
+    iter_parse("tests/sample.mid", out=FlushLog())
+    assert flushed[0] == parse("tests/sample.mid")[0]
+
+
+def test_formatters_match_write_event():
+    assert midi_to_csv_map[NoteOnEvent](2, 10, NoteOnEvent(channel=9, data=[36, 100])) == write_event(
+        2, 10, "Note_on_c", [9, 36, 100]
+    )
+    # Events with an unexpected number of data bytes go through write_event
+    event = ProgramChangeEvent(channel=1, data=[5, 6])
+    assert midi_to_csv_map[ProgramChangeEvent](1, 0, event) == "1, 0, Program_c, 1, 5, 6\n"
+
+
+def test_text_codecs():
+    payload = bytes(range(256)).replace(b'"', b"")
+    text = as_csv_str(payload)
+    assert text.startswith("\\000\\001") and "\\\\" in text
+    assert as_midi_bytes(text) == payload
+    assert as_csv_str(list(b'say "hi"')) == 'say ""hi""'
+    for malformed in ("\\400", "trailing \\", "\u0100"):
+        with pytest.raises(Exception):
+            as_midi_bytes(malformed)
+
+
+def test_midicsv_stream_merges_tracks_in_time_order():
+    lines = parse("tests/sample.mid")
+
+    def key(line):
+        track, time, _ = line.split(", ", 2)
+        return int(time), int(track)
+
+    expected = [lines[0], *sorted(lines[1:-1], key=key), lines[-1]]
+    assert list(iter_parse("tests/sample.mid", merge=True)) == expected
+    with open("tests/sample.mid", "rb") as f:
+        stream = io.BufferedReader(io.BytesIO(f.read()))
+    assert list(iter_parse(stream, merge=True)) == expected
+
+
+def test_csvmidi_stream_parse():
+    lines = parse("tests/sample.mid")
+    assert csvmidi_stream.parse(lines) == csv_to_midi(lines)
+    text = (
+        '0, 0, HEADER, 1, 1, 96\n# comment\n\n1, 0, start_track\n1, 0, Text_t, "two\nlines, quoted"\n'
+        "1, 10, NOTE_ON_C, 0, 60, 100\n1, 20, note_off_c, 0, 60, 0\n1, 20, End_Track\n0, 0, end_of_file\n"
+    )
+    records = list(csvmidi_stream.tokenize(io.StringIO(text)))
+    assert [record[:4] for record in records[3:-1]] == [
+        (7, 1, 10, "Note_on_c"),
+        (8, 1, 20, "Note_off_c"),
+        (9, 1, 20, "End_track"),
+    ]
+    assert records[2][4] == ["two\nlines, quoted"]
+    pattern = csvmidi_stream.parse(io.StringIO(text))
+    assert [event.tick for event in pattern[0]] == [0, 10, 10, 0]
+    for bad in ("1, 0, Nonsense", "1, 0, Note_on_c, 0, 60", "1, 0, Note_on_c, 0, x, 1"):
+        with pytest.raises(csvmidi_stream.CSVError, match="^Line 3: "):
+            csvmidi_stream.parse(io.StringIO(f"0, 0, Header, 1, 1, 96\n1, 0, Start_track\n{bad}\n"))
+    # Lines from splitlines() have no line breaks, and blank ones are empty
+    stripped = [line.rstrip("\n") for line in lines]
+    assert csvmidi_stream.parse(stripped[:2] + [""] + stripped[2:]) == csv_to_midi(lines)
+    with pytest.raises(csvmidi_stream.CSVError, match="^Line 4: "):
+        csvmidi_stream.parse(["0, 0, Header, 1, 1, 96", "", "1, 0, Start_track", "1, 0, Nonsense"])
+    for convert in (csvmidi_stream.parse, lambda lines: csvmidi_stream.transcode(lines, io.BytesIO())):
+        with pytest.raises(csvmidi_stream.CSVError, match="^Line 2: record before Start_track$"):
+            convert(["0, 0, Header, 1, 1, 96\n", "1, 0, Note_on_c, 0, 60, 100\n", "1, 0, Start_track\n"])
+
+
+def test_csvmidi_stream_transcode_matches_parse():
+    lines = parse("tests/sample.mid")
+    for running_status, note_off_as_note_on in ((True, False), (False, False), (True, True)):
+        expected = io.BytesIO()
+        FileWriter(expected, running_status, note_off_as_note_on).write(csv_to_midi(lines))
+        for out in (io.BytesIO(), PipeWriter()):
+            writer = csvmidi_stream.transcode(lines, out, running_status, note_off_as_note_on)
+            assert bytes(out.getvalue() if isinstance(out, io.BytesIO) else out.data) == expected.getvalue()
+        assert writer.status_bytes_saved > 0 or not running_status
+    # A track count that is not a number is accepted like csvmidi.parse does, where the tracks can be counted
+    odd = ["0, 0, Header, 1, 6;, 96\n", "1, 0, Start_track\n", "1, 0, End_track\n", "2, 0, Start_track\n"]
+    expected = io.BytesIO()
+    FileWriter(expected).write(csv_to_midi(odd))
+    for workers in (None, 2):
+        out = io.BytesIO()
+        csvmidi_stream.transcode(odd, out, workers=workers)
+        assert out.getvalue() == expected.getvalue()
+        with pytest.raises(csvmidi_stream.CSVError, match="^Line 1: Header track count is not a number"):
+            csvmidi_stream.transcode(odd, PipeWriter(), workers=workers)
+    # With a seekable output the MThd track count is counted, not taken from the Header record
+    out = io.BytesIO()
+    csvmidi_stream.transcode(["0, 0, Header, 0, 5, 96\n", "1, 0, Start_track\n", "1, 0, End_track\n"], out)
+    assert out.getvalue()[10:12] == b"\x00\x01"
+
+
+def test_csvmidi_stream_sorts_records():
+    lines = parse("tests/sample.mid")
+    expected = csv_to_midi(lines)
+    # The events of every track from the last time to the first, between its Start_track and End_track
+    shuffled, body = [], []
+    for line in lines:
+        if line.split(", ")[2].startswith(("Start_track", "End_track", "End_of_file")):
+            shuffled += sorted(body, key=lambda line: int(line.split(", ")[1]), reverse=True)
+            shuffled.append(line)
+            body = []
+        else:
+            body.append(line)
+    assert shuffled != lines
+    # A record limit of 3 spills runs to temporary files and merges them in more than one level
+    for memory_limit in (csvmidi_stream.SORT_MEMORY_LIMIT, 3 * csvmidi_stream.SORT_RECORD_SIZE):
+        assert csvmidi_stream.parse(shuffled, sort=True, memory_limit=memory_limit) == expected
+    records = csvmidi_stream.tokenize(shuffled)
+    records = list(csvmidi_stream.sort_records(records, 2 * csvmidi_stream.SORT_RECORD_SIZE))
+    assert [record[3] for record in records[:2]] == ["Header", "Start_track"]
+    assert records[-1][3] == "End_of_file"
+    # Records that tie keep their input order, given by their line numbers
+    for a, b in zip(records, records[1:]):
+        assert csvmidi_stream.sort_key(a) < csvmidi_stream.sort_key(b) or a[0] < b[0]
+
+
+def test_csvmidi_stream_sorts_tracks_by_start_track_not_track_column():
+    # The second track is labelled 1 like the first, and its notes are out of order
+    note_on, note_off = "1, 10, Note_on_c, 0, 60, 100\n", "1, 20, Note_off_c, 0, 60, 0\n"
+    head = "0, 0, Header, 1, 2, 96\n1, 0, Start_track\n1, 0, Tempo, 500000\n1, 0, End_track\n1, 0, Start_track\n"
+    tail = "1, 20, End_track\n0, 0, End_of_file\n"
+    text, ordered = head + note_off + note_on + tail, head + note_on + note_off + tail
+    pattern = csvmidi_stream.parse(io.StringIO(text), sort=True)
+    assert pattern == csv_to_midi(io.StringIO(ordered))
+    assert [len(track) for track in pattern] == [2, 3]
+
+
+def test_csvmidi_stream_transcode_in_parallel():
+    lines = parse("tests/sample.mid")
+    expected = io.BytesIO()
+    csvmidi_stream.transcode(lines, expected)
+    for out in (io.BytesIO(), PipeWriter()):
+        writer = csvmidi_stream.transcode(lines, out, workers=2)
+        assert bytes(out.getvalue() if isinstance(out, io.BytesIO) else out.data) == expected.getvalue()
+    assert writer.status_bytes_saved == csvmidi_stream.transcode(lines, io.BytesIO()).status_bytes_saved
+    # Running status starts over in every track, also after a track without End_track
+    unended = [line for line in lines if not (line.startswith("2, ") and "End_track" in line)]
+    serial = io.BytesIO()
+    csvmidi_stream.transcode(unended, serial)
+    out = io.BytesIO()
+    csvmidi_stream.transcode(unended, out, workers=2)
+    assert out.getvalue() == serial.getvalue()
+    assert len(read_midifile(io.BytesIO(serial.getvalue()), True)) == len(csv_to_midi(lines))
+    # Errors in a worker report the line number in the whole file
+    broken = list(lines)
+    line = max(index for index, text in enumerate(lines) if text.startswith("4, ")) - 1
+    broken[line] = "4, 0, Note_on_c, 0, 60\n"
+    for workers in (None, 2):
+        with pytest.raises(csvmidi_stream.CSVError, match=f"^Line {line + 1}: "):
+            csvmidi_stream.transcode(broken, io.BytesIO(), workers=workers)
+
+
+def test_csvmidi_stream_transcode_cached_reuses_unchanged_tracks():
+    lines = parse("tests/sample.mid")
+    expected = io.BytesIO()
+    csvmidi_stream.transcode(lines, expected)
+    out = io.BytesIO()
+    cache = csvmidi_stream.transcode_cached("".join(lines), out)
+    assert out.getvalue() == expected.getvalue()
+    # Change one note in the last track; the other tracks come from the cache
+    note = max(index for index, line in enumerate(lines) if ", Note_on_c, " in line)
+    lines[note] = lines[note].rsplit(", ", 1)[0] + ", 99\n"
+    expected, out = io.BytesIO(), io.BytesIO()
+    csvmidi_stream.transcode(lines, expected)
+    new_cache = csvmidi_stream.transcode_cached("".join(lines), out, cache)
+    assert out.getvalue() == expected.getvalue()
+    assert sum(result is cache.get(section) for section, result in new_cache.items()) == len(cache) - 1
@@ -0,0 +1,250 @@
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from helpers import PipeWriter
+
+from py_midicsv.events import midi_to_csv_map
+from py_midicsv.midi.containers import Pattern, Track
+from py_midicsv.midi.events import EndOfTrackEvent, NoteOnEvent
+from py_midicsv.midicsv import parse as midi_to_csv
+from py_midicsv.midi.fileio import (
+    FileWriter,
+    ValidationError,
+    iter_events,
+    read_midifile,
+    validate_pattern,
+)
+
+
+def read_both(data):
+    legacy = read_midifile(io.BytesIO(data), True, mapped=False)
+    mapped = read_midifile(io.BytesIO(data), True)
+    return legacy, mapped
+
+
+def test_mapped_reader_matches_legacy_reader():
+    with open("tests/sample.mid", "rb") as f:
+        data = f.read()
+    legacy, mapped = read_both(data)
+    assert (mapped.format, mapped.resolution) == (legacy.format, legacy.resolution)
+    assert [list(track) for track in mapped] == [list(track) for track in legacy]
+    assert read_midifile("tests/sample.mid", True) == mapped
+
+
+def test_mapped_reader_drops_truncated_event():
+    with open("tests/sample.mid", "rb") as f:
+        data = f.read()
+    legacy, mapped = read_both(data[:-3])
+    assert [list(track) for track in mapped] == [list(track) for track in legacy]
+
+
+def test_lazy_pattern_decodes_tracks_on_access():
+    pattern = read_midifile("tests/sample.mid", True, lazy=True)
+    eager = read_midifile("tests/sample.mid", True)
+    assert len(pattern) == len(eager)
+    assert pattern.resolution == eager.resolution
+    assert not any(pattern.is_loaded(i) for i in range(len(pattern)))
+    assert pattern[-1] == eager[-1]
+    assert pattern.is_loaded(len(pattern) - 1)
+    assert not pattern.is_loaded(0)
+    assert pattern == eager
+
+
+def test_lazy_pattern_writes_like_eager_pattern():
+    eager, lazy = io.BytesIO(), io.BytesIO()
+    FileWriter(eager).write(read_midifile("tests/sample.mid", True))
+    FileWriter(lazy).write(read_midifile("tests/sample.mid", True, lazy=True))
+    assert lazy.getvalue() == eager.getvalue()
+
+
+def test_lazy_pattern_loads_tracks_concurrently():
+    eager = read_midifile("tests/sample.mid", True)
+    pattern = read_midifile("tests/sample.mid", True, lazy=True)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        tracks = list(executor.map(pattern.__getitem__, reversed(range(len(pattern)))))
+    assert tracks[::-1] == list(eager)
+    assert pattern.useRunningStatus == eager.useRunningStatus
+
+
+def test_parallel_read_matches_serial_read():
+    pattern = read_midifile("tests/sample.mid", True, workers=2)
+    assert pattern == read_midifile("tests/sample.mid", True)
+
+
+def test_parallel_read_reports_absolute_error_position():
+    with open("tests/sample.mid", "rb") as f:
+        data = bytearray(f.read())
+    start = data.index(b"MTrk", 14) + 8
+    data[start + 1] = 0x40  # data byte where the first status byte of track 2 should be
+    for workers in (None, 2):
+        with pytest.raises(AssertionError, match=f"Unexpected data byte 0x40 at position {start + 2}$"):
+            read_midifile(io.BytesIO(bytes(data)), True, workers=workers)
+
+
+def test_iter_events_yields_absolute_ticks_in_file_order():
+    pattern = read_midifile("tests/sample.mid", True)
+    pattern.make_ticks_abs()
+    expected = [(index, event.tick, event) for index, track in enumerate(pattern) for event in track]
+    events = iter_events("tests/sample.mid")
+    assert (len(events), events.resolution) == (len(pattern), pattern.resolution)
+    assert [(index, tick, type(event), event.data) for index, tick, event in events] == [
+        (index, tick, type(event), event.data) for index, tick, event in expected
+    ]
+
+
+def test_encoder_table_matches_generic_encoder():
+    pattern = read_midifile("tests/sample.mid", True)
+    for use_running_status in (False, True):
+        table, generic = FileWriter(None, use_running_status), FileWriter(None, use_running_status)
+        for event in (event for track in pattern for event in track):
+            assert table.encode_midi_event(event) == generic.encode_generic_event(event)
+
+
+def test_compact_events_convert_and_encode_like_regular_events():
+    regular = read_midifile("tests/sample.mid", True)
+    compact = read_midifile("tests/sample.mid", True, compact=True)
+    assert type(compact[1][1]).__name__ == "Compact" + type(regular[1][1]).__name__
+    assert not hasattr(compact[1][1], "__dict__")
+    for regular_track, compact_track in zip(regular, compact):
+        for a, b in zip(regular_track, compact_track):
+            assert midi_to_csv_map[type(a)](1, a.tick, a) == midi_to_csv_map[type(b)](1, b.tick, b)
+    assert write_bytes(compact) == write_bytes(regular)
+
+
+def test_validation_modes_accept_valid_input_alike():
+    full = read_midifile("tests/sample.mid", True)
+    for validation in ("fast", "none"):
+        assert read_midifile("tests/sample.mid", True, validation=validation) == full
+        events = iter_events("tests/sample.mid", validation=validation)
+        assert sum(1 for _ in events) == sum(len(track) for track in full)
+
+
+@pytest.mark.parametrize(
+    "body, message",
+    [
+        (b"\x00\x90\x3c\x90", "Velocity value is out of range: 144"),
+        (b"\x00\xff\x51\x02\x07\xa1", "Event length mismatch for SetTempoEvent"),
+    ],
+)
+def test_validation_modes_reject_invalid_input_alike(body, message):
+    data = single_track_file(body)
+    for validation in ("full", "fast"):
+        with pytest.raises(ValidationError, match=message):
+            read_midifile(io.BytesIO(data), True, validation=validation)
+        with pytest.raises(ValidationError, match=message):
+            list(iter_events(io.BytesIO(data), validation=validation))
+    assert len(read_midifile(io.BytesIO(data), True, validation="none")[0]) == 2
+
+
+def test_validate_pattern_checks_built_patterns():
+    pattern = read_midifile("tests/sample.mid", True)
+    for validation in ("none", "fast", "full"):
+        assert validate_pattern(pattern, validation) is pattern
+    pattern[1][1].data = [60, 300]
+    for validation in ("fast", "full"):
+        with pytest.raises(ValidationError, match="out of range: 300 in track 1$"):
+            validate_pattern(pattern, validation)
+    with pytest.raises(ValueError, match="Unknown validation mode"):
+        validate_pattern(pattern, "quick")
+
+
+def test_writer_running_status_modes():
+    pattern = read_midifile("tests/sample.mid", True)
+    sizes = {}
+    for running_status in (False, True):
+        out = io.BytesIO()
+        writer = FileWriter(out, running_status=running_status)
+        writer.write(pattern)
+        sizes[running_status] = len(out.getvalue()), writer.status_bytes_saved
+        assert read_midifile(io.BytesIO(out.getvalue()), True) == pattern
+    assert sizes[False][1] == 0
+    assert sizes[True][0] == sizes[False][0] - sizes[True][1]
+
+
+def test_writer_resets_running_status_between_tracks():
+    # The first track has no End_track, so its status byte is still current when the second one starts
+    note = NoteOnEvent(tick=0, channel=0, data=[62, 100])
+    pattern = Pattern([Track([note]), Track([note, EndOfTrackEvent(tick=10)])], resolution=96)
+    out = io.BytesIO()
+    FileWriter(out, running_status=True).write(pattern)
+    assert out.getvalue().endswith(b"MTrk\x00\x00\x00\x08\x00\x90\x3e\x64\x0a\xff\x2f\x00")
+    assert read_midifile(io.BytesIO(out.getvalue()), True) == pattern
+    streamed = io.BytesIO()
+    writer = FileWriter(streamed, running_status=True)
+    writer.write_file_header(pattern)
+    for track in pattern:
+        writer.begin_track()
+        writer.write_channel_message(0, 0x90, (62, 100))
+        writer.write_events(track[1:])
+        writer.end_track()
+    assert streamed.getvalue() == out.getvalue()
+
+
+def test_writer_note_off_as_note_on():
+    pattern = read_midifile("tests/sample.mid", True)
+    out = io.BytesIO()
+    writer = FileWriter(out, running_status=True, note_off_as_note_on=True)
+    writer.write(pattern)
+    rewritten = read_midifile(io.BytesIO(out.getvalue()), True)
+    for track, new_track in zip(pattern, rewritten):
+        for event, new_event in zip(track, new_track):
+            if event.statusmsg == 0x80:
+                assert (new_event.statusmsg, new_event.data) == (0x90, [event.data[0], 0])
+            else:
+                assert new_event == event
+
+
+def convert(data):
+    pattern = read_midifile(io.BytesIO(data), True)
+    out = io.BytesIO()
+    FileWriter(out).write(pattern)
+    return out.getvalue(), midi_to_csv(io.BytesIO(data))
+
+
+def test_concurrent_conversions_do_not_interfere():
+    with open("tests/sample.mid", "rb") as f:
+        compressed = f.read()
+    plain = io.BytesIO()
+    FileWriter(plain, running_status=False).write(read_midifile(io.BytesIO(compressed), True))
+    inputs = [compressed, plain.getvalue()] * 16
+    expected = [convert(data) for data in inputs[:2]] * 16
+    assert expected[0][0] != expected[1][0]
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(convert, inputs))
+    finally:
+        sys.setswitchinterval(interval)
+    assert results == expected
+
+
+def test_streaming_writer_matches_write():
+    pattern = read_midifile("tests/sample.mid", True)
+    expected = write_bytes(pattern)
+    for sink in (io.BytesIO(), PipeWriter()):
+        writer = FileWriter(sink)
+        # Force tracks past the write buffer and the in-memory spill buffer
+        writer.write_buffer_size, writer.spill_buffer_size = 16, 64
+        writer.write_file_header(pattern)
+        for track in pattern:
+            writer.begin_track()
+            for event in track:
+                writer.write_event(event)
+            writer.end_track()
+        assert bytes(sink.getvalue() if isinstance(sink, io.BytesIO) else sink.data) == expected
+    with pytest.raises(RuntimeError):
+        FileWriter(io.BytesIO()).write_event(pattern[0][0])
+
+
+def single_track_file(body):
+    body += b"\x00\xff\x2f\x00"
+    return b"MThd\x00\x00\x00\x06\x00\x00\x00\x01\x00\x60MTrk" + len(body).to_bytes(4, "big") + body
+
+
+def write_bytes(pattern):
+    out = io.BytesIO()
+    FileWriter(out).write(pattern)
+    return out.getvalue()
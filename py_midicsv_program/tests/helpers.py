@@ -0,0 +1,15 @@
+import io
+
+
+class PipeWriter(io.RawIOBase):
+    """Unseekable binary sink, like a pipe."""
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.data += b
+        return len(b)
@@ -0,0 +1,42 @@
+import io
+
+import pytest
+
+from py_midicsv import csvmidi_stream
+from py_midicsv.csvmidi import parse as csv_to_midi
+from py_midicsv.events import csv_parameter_counts, csv_type_names
+from py_midicsv.midicsv import parse
+from single_line_parser import iter_lines
+
+
+def test_parameter_counts_cover_all_record_types():
+    assert set(csv_parameter_counts) == set(csv_type_names.values())
+
+
+def test_single_line_records_match_multi_line_records():
+    lines = parse("tests/sample.mid")
+    text = ",".join(line.rstrip("\n") for line in lines)
+    # Small chunks put record, field and quote boundaries between reads
+    for chunk_size in (1, 7, 4096):
+        assert csv_to_midi(list(iter_lines(io.StringIO(text), chunk_size))) == csv_to_midi(lines)
+
+
+def test_single_line_quoted_and_variable_length_fields():
+    text = '0,0,Header,1,1,96,1,0,Start_track,1,0,text_t,"a, ""b""\nc",1,0,System_exclusive,3,F0,01,F7,1,0,End_track\n'
+    for chunk_size in (1, 2, 5):
+        assert list(iter_lines(io.StringIO(text), chunk_size)) == [
+            "0, 0, Header, 1, 1, 96\n",
+            "1, 0, Start_track\n",
+            '1, 0, text_t, "a, ""b""\nc"\n',
+            "1, 0, System_exclusive, 3, F0, 01, F7\n",
+            "1, 0, End_track\n",
+        ]
+    pattern = csvmidi_stream.parse(iter_lines(io.StringIO(text)))
+    assert pattern[0][0].text == b'a, "b"\nc'
+    for bad, message in (
+        ("0,0,Header,1,1", "Incomplete record"),
+        ("0,0,Header,1,1,96,1,0,Bogus", "Record 2: Unknown record type"),
+        ('1,0,Text_t,"open', "Unterminated"),
+    ):
+        with pytest.raises(csvmidi_stream.CSVError, match=message):
+            list(iter_lines(io.StringIO(bad)))
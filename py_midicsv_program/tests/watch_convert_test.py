@@ -0,0 +1,95 @@
+import threading
+import time
+
+import pytest
+
+from batch_convert import convert_timed
+from py_midicsv.midicsv import parse
+import watch_convert
+from watch_convert import PollWatcher, convert_warm, forget, track_cache, watch
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+@pytest.mark.parametrize("poll", [True, False])
+def test_watch_converts_new_and_changed_files(tmp_path, capsys, poll):
+    lines = parse("tests/sample.mid")
+    inputs, outputs, expected = tmp_path / "Input", tmp_path / "Output", tmp_path / "Expected"
+    inputs.mkdir()
+    expected.mkdir()
+    (inputs / "old.csv").write_text("".join(lines))
+    stop = threading.Event()
+    thread = threading.Thread(target=watch, args=(str(inputs), str(outputs), 1, poll), kwargs={"stop": stop})
+    output = []
+
+    def converted(count):
+        output.append(capsys.readouterr().out)
+        return "".join(output).count("✓ Converted") == count
+
+    thread.start()
+    try:
+        wait_for(lambda: converted(1))
+        for done, count in enumerate((300, 200), 2):
+            (inputs / "new.csv").write_text("".join(lines[:count]) + "0, 0, End_of_file\n")
+            wait_for(lambda: converted(done))
+            convert_timed(str(inputs / "new.csv"), str(expected))
+            assert (outputs / "new.mid").read_bytes() == (expected / "new.mid").read_bytes()
+        # Rewriting a file with the same content does not convert it again
+        (inputs / "old.csv").write_text("".join(lines))
+        time.sleep(0.3)
+        assert converted(3)
+    finally:
+        stop.set()
+        thread.join()
+    assert (outputs / ".midicsv-manifest.json").exists()
+    convert_timed(str(inputs / "old.csv"), str(expected))
+    assert (outputs / "old.mid").read_bytes() == (expected / "old.mid").read_bytes()
+
+
+def test_convert_warm_matches_batch_conversion(tmp_path):
+    # Both share the manifest settings, so each takes the other's outputs as current
+    # The second track starts with the status byte the first one, which has no End_track, ends with
+    unended = ["0, 0, Header, 1, 3, 96\n", "1, 0, Start_track\n", "1, 0, End_track\n", "2, 0, Start_track\n"]
+    unended += ["2, 0, Note_on_c, 0, 62, 100\n", "3, 0, Start_track\n", "3, 0, Note_on_c, 0, 62, 100\n"]
+    for name, text in (("whole", parse("tests/sample.mid")), ("unended", unended)):
+        csv_file = tmp_path / f"{name}.csv"
+        csv_file.write_text("".join(text))
+        (tmp_path / "batch").mkdir(exist_ok=True)
+        (tmp_path / "warm").mkdir(exist_ok=True)
+        assert convert_timed(str(csv_file), str(tmp_path / "batch"))[2] is None
+        # Twice, the second time from the tracks kept by the first
+        for _ in range(2):
+            assert convert_warm(str(csv_file), str(tmp_path / "warm"))[2] is None
+            assert (tmp_path / "warm" / f"{name}.mid").read_bytes() == (tmp_path / "batch" / f"{name}.mid").read_bytes()
+    track_cache.clear()
+
+def test_convert_warm_bounds_and_forgets_kept_tracks(tmp_path, monkeypatch):
+    text = "".join(parse("tests/sample.mid"))
+    paths = [str(tmp_path / f"{name}.csv") for name in "abc"]
+    for path in paths:
+        with open(path, "w") as f:
+            f.write(text)
+    track_cache.clear()
+    convert_warm(paths[0], str(tmp_path))
+    size = track_cache[paths[0]][0]
+    assert size > len(text)
+    # Room for the tracks of two files: converting a third drops the least recently converted
+    monkeypatch.setattr(watch_convert, "TRACK_CACHE_SIZE", 2 * size)
+    for path in paths[1:] + paths[:1]:
+        convert_warm(path, str(tmp_path))
+    assert list(track_cache) == paths[2:] + paths[:1]
+    forget(paths[0])
+    assert list(track_cache) == paths[2:]
+    track_cache.clear()
+
+
+def test_poll_watcher_reports_removed_files(tmp_path):
+    (tmp_path / "gone.csv").write_text("")
+    watcher = PollWatcher(str(tmp_path))
+    (tmp_path / "gone.csv").unlink()
+    assert watcher.wait(1) == {"gone.csv"}
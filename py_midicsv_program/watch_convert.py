@@ -0,0 +1,266 @@
+import argparse
+import ctypes
+import ctypes.util
+import io
+import os
+import select
+import struct
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from batch_convert import midi_path, report
+from py_midicsv.csvmidi_stream import transcode_cached
+from py_midicsv.manifest import Manifest, atomic_open
+
+# Seconds a file must be left alone after a change before it is converted
+DEBOUNCE = 0.03
+
+# Seconds between directory scans when inotify is not available
+POLL_INTERVAL = 0.05
+
+# Seconds between checks for finished conversions while some are running
+RESULT_INTERVAL = 0.002
+
+# Worker processes converting files
+WORKERS = 2
+
+# Characters of CSV text and bytes of encoded tracks each worker keeps for the files it converted
+TRACK_CACHE_SIZE = 64 << 20
+
+# inotify flags from <sys/inotify.h>
+IN_MODIFY = 0x2
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_DELETE = 0x200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+INOTIFY_EVENT = struct.Struct("iIII")
+
+# Sizes and encoded tracks of the files converted in this process, least recently converted first, see convert_warm
+track_cache = OrderedDict()
+
+
+def cache_tracks(csv_file, tracks):
+    """Keeps the tracks of csv_file, dropping those of the least recently converted files beyond TRACK_CACHE_SIZE."""
+    size = sum(len(section) + len(result[0]) for section, result in tracks.items())
+    track_cache[csv_file] = size, tracks
+    total = sum(size for size, _ in track_cache.values())
+    while total > TRACK_CACHE_SIZE:
+        _, (size, _) = track_cache.popitem(last=False)
+        total -= size
+
+
+def forget(csv_file):
+    """Drops the tracks kept for csv_file, once it is removed."""
+    track_cache.pop(csv_file, None)
+
+
+def convert_warm(csv_file, output_dir):
+    """Convert a CSV file to MIDI like batch_convert.convert_timed, but only re-encode the tracks that changed.
+
+    The tracks of the files converted last are kept in this worker
+    process, up to TRACK_CACHE_SIZE, so an edit to one track of a file
+    converted here before only encodes that track again.
+    """
+    start = time.perf_counter()
+    midi_file = midi_path(csv_file, output_dir)
+    try:
+        with open(csv_file, 'r') as csv_input:
+            text = csv_input.read()
+        midi_data = io.BytesIO()
+        _, tracks = track_cache.pop(csv_file, (0, None))
+        cache_tracks(csv_file, transcode_cached(text, midi_data, tracks))
+        with atomic_open(midi_file) as midi_output:
+            midi_output.write(midi_data.getbuffer())
+        error = None
+    except Exception as e:
+        error = str(e)
+    return csv_file, midi_file, error, time.perf_counter() - start
+
+
+class PollWatcher:
+    """Find changed and removed CSV files by comparing the sizes and modification times in directory listings."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.seen = self.scan()
+        self.scanned = time.monotonic()
+
+    def scan(self):
+        listing = {}
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.csv') and entry.is_file():
+                st = entry.stat()
+                listing[entry.name] = (st.st_size, st.st_mtime_ns)
+        return listing
+
+    def wait(self, timeout):
+        """Return the names of the CSV files changed or removed since the last call, waiting at most timeout seconds."""
+        # The directory is scanned at most every POLL_INTERVAL, however short the timeout
+        remaining = self.scanned + POLL_INTERVAL - time.monotonic()
+        if remaining > timeout:
+            time.sleep(timeout)
+            return set()
+        time.sleep(max(remaining, 0))
+        listing = self.scan()
+        self.scanned = time.monotonic()
+        changed = {name for name, stat in listing.items() if self.seen.get(name) != stat}
+        changed.update(self.seen.keys() - listing.keys())
+        self.seen = listing
+        return changed
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """Find changed and removed CSV files through Linux inotify, called through ctypes."""
+
+    def __init__(self, directory):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError("inotify is not available")
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"Cannot watch {directory}")
+
+    def wait(self, timeout):
+        """Return the names of the CSV files changed or removed since the last call, waiting at most timeout seconds."""
+        changed = set()
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return changed
+        try:
+            data = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return changed
+        pos = 0
+        while pos < len(data):
+            _, _, _, length = INOTIFY_EVENT.unpack_from(data, pos)
+            pos += INOTIFY_EVENT.size
+            name = os.fsdecode(data[pos : pos + length].rstrip(b'\0'))
+            pos += length
+            if name.endswith('.csv'):
+                changed.add(name)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+def make_watcher(directory, poll=False):
+    """Return an InotifyWatcher for directory if inotify is available, or a PollWatcher."""
+    if not poll:
+        try:
+            return InotifyWatcher(directory)
+        except (OSError, AttributeError, TypeError):
+            pass
+    return PollWatcher(directory)
+
+
+def watch(input_dir, output_dir, jobs=WORKERS, poll=False, debounce=DEBOUNCE, stop=None):
+    """Convert the CSV files in input_dir to MIDI whenever they are added or changed.
+
+    Runs until stop, a threading.Event, is set or the process is
+    interrupted. Files whose content was converted before are skipped,
+    as in batch_convert's incremental mode and with the same manifest.
+    A file is converted once it has not changed for debounce seconds.
+    Each file is always converted by the same one of jobs worker
+    processes, which keeps its encoded tracks for the next change until
+    the file is removed or TRACK_CACHE_SIZE is used by other files.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    watcher = make_watcher(input_dir, poll)
+    manifest = Manifest(output_dir)
+    workers = [ProcessPoolExecutor(max_workers=1) for _ in range(jobs)]
+    for worker in workers:
+        # Start the processes now rather than on the first change
+        worker.submit(os.getpid)
+    print(f"Watching {input_dir} with {type(watcher).__name__} and {jobs} workers, press Ctrl+C to stop")
+    # Files to convert, by the time they may be converted; existing files are checked right away
+    due = {name: 0 for name in os.listdir(input_dir) if name.endswith('.csv')}
+    running = {}
+    keys = {}
+    try:
+        while stop is None or not stop.is_set():
+            now = time.monotonic()
+            for name, deadline in list(due.items()):
+                if deadline > now or name in running:
+                    continue
+                del due[name]
+                csv_path = os.path.join(input_dir, name)
+                worker = workers[hash(name) % jobs]
+                try:
+                    key = manifest.key(csv_path)
+                except OSError:
+                    # Removed or renamed since it changed
+                    worker.submit(forget, csv_path)
+                    continue
+                if manifest.lookup(key, midi_path(csv_path, output_dir)) is None:
+                    keys[name] = key
+                    running[name] = worker.submit(convert_warm, csv_path, output_dir)
+
+            finished = [name for name, future in running.items() if future.done()]
+            for name in finished:
+                result = running.pop(name).result()
+                key = keys.pop(name)
+                if report(result):
+                    manifest.record(key, result[1])
+            if finished and not running:
+                manifest.save()
+
+            timeout = min([deadline - now for deadline in due.values()] + [POLL_INTERVAL])
+            if running:
+                timeout = min(timeout, RESULT_INTERVAL)
+            changed = watcher.wait(max(timeout, 0))
+            deadline = time.monotonic() + debounce
+            for name in changed:
+                due[name] = deadline
+    finally:
+        watcher.close()
+        for worker in workers:
+            worker.shutdown(cancel_futures=True)
+        manifest.save()
+
+
+if __name__ == "__main__":
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Convert CSV files to MIDI as they are added to or changed in Input/.")
+    parser.add_argument("input_dir", nargs="?", default=os.path.join(script_dir, "Input"))
+    parser.add_argument("output_dir", nargs="?", default=os.path.join(script_dir, "Output"))
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=WORKERS,
+        help=f"Convert files in this many worker processes (default: {WORKERS})",
+    )
+    parser.add_argument("--poll", action="store_true", help="Scan the directory instead of using inotify")
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=DEBOUNCE,
+        help=f"Seconds a file must be left alone before it is converted (default: {DEBOUNCE})",
+    )
+    args = parser.parse_args()
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if not os.path.isdir(args.input_dir):
+        parser.error(f"Input directory {args.input_dir} not found")
+
+    print("CSV to MIDI Watch Mode")
+    print("======================\n")
+    try:
+        watch(args.input_dir, args.output_dir, args.jobs, args.poll, args.debounce)
+    except KeyboardInterrupt:
+        print("\nStopped watching.")